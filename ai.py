@@ -1,21 +1,141 @@
-import openai
+import time
+import json
 import logging
-from config import OPENAI_API_KEY
+from config import AI_CACHE_TTL, AI_CACHE_MAX_MB, AI_CACHE_PATH
+from ai_cache import AIResponseCache
+from ai_client import ai_client, estimate_tokens
 
-openai.api_key = OPENAI_API_KEY
+OPENAI_MODEL = "gpt-3.5-turbo"
+SYSTEM_PROMPT = "Eres SkyIntel AI, un asistente experto en análisis de datos web, GA4 y redes sociales. Responde en español, claro, conciso y enfocado en insights accionables."
 
-def get_openai_response(prompt, context=""):
-    """Función para obtener respuesta de OpenAI."""
+_ai_cache = AIResponseCache(ttl=AI_CACHE_TTL, max_bytes=int(AI_CACHE_MAX_MB * 1024 * 1024), path=AI_CACHE_PATH or None)
+
+def get_cached_openai_response(prompt, context=""):
+    """Respuesta ya cacheada para este prompt y contexto, o None (no llama a OpenAI)."""
+    return _ai_cache.get(AIResponseCache.key(OPENAI_MODEL, SYSTEM_PROMPT, prompt, context))
+
+def _messages(prompt, context):
+    full_prompt = f"{context}\n\nPregunta/Tarea: {prompt}\n\nResponde en español:"
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": full_prompt}
+    ]
+
+def get_openai_response(prompt, context="", timeout=None):
+    """Función para obtener respuesta de OpenAI (cacheada por contenido: mismo prompt y contexto, misma respuesta)."""
+    cache_key = AIResponseCache.key(OPENAI_MODEL, SYSTEM_PROMPT, prompt, context)
+    cached = _ai_cache.get(cache_key)
+    if cached is not None:
+        return cached
     try:
-        full_prompt = f"{context}\n\nPregunta/Tarea: {prompt}\n\nResponde en español:"
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Eres SkyIntel AI, un asistente experto en análisis de datos web, GA4 y redes sociales. Responde en español, claro, conciso y enfocado en insights accionables."},
-                {"role": "user", "content": full_prompt}
-            ]
+        started = time.monotonic()
+        response = ai_client.chat_completion(
+            model=OPENAI_MODEL,
+            messages=_messages(prompt, context),
+            timeout=timeout
         )
-        return response.choices[0].message.content.strip()
+        text = response.choices[0].message.content.strip()
+        usage = getattr(response, 'usage', None)
+        _ai_cache.set(cache_key, text, time.monotonic() - started, getattr(usage, 'total_tokens', 0))
+        return text
     except Exception as e:
         logging.error(f"Error llamando a OpenAI: {e}")
-        return f"Hubo un error al contactar al asistente de IA: {e}. ¿Está bien configurada la API Key?"
\ No newline at end of file
+        return f"Hubo un error al contactar al asistente de IA: {e}. ¿Está bien configurada la API Key?"
+
+def _insights_messages(tasks):
+    sections = "\n\n".join(f"### {name}\n{context}\nPregunta/Tarea: {prompt}" for name, (prompt, context) in tasks.items())
+    keys = ", ".join(f'"{name}"' for name in tasks)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"{sections}\n\nResponde en español con un objeto JSON cuyas claves sean exactamente {keys} y cuyo valor sea el texto del análisis de cada tarea."}
+    ]
+
+def _parse_insights(text, names):
+    """Valida la respuesta JSON y devuelve solo las tareas con un texto no vacío."""
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise ValueError("la respuesta no es un objeto JSON")
+    return {name: data[name].strip() for name in names if isinstance(data.get(name), str) and data[name].strip()}
+
+def get_openai_insights(tasks, timeout=None, fallback=True):
+    """Resuelve varios insights con nombre (`tasks`: nombre -> (prompt, contexto)) en una sola llamada.
+
+    Las tareas ya cacheadas no se envían; el resto va en una única petición que pide un objeto
+    JSON con una clave por tarea, y cada respuesta válida se cachea como si se hubiera pedido
+    por separado. Si la respuesta no se puede interpretar, las tareas que falten se piden una a
+    una con `get_openai_response` (o, con `fallback=False`, se omiten del resultado).
+    """
+    results, pending = {}, {}
+    for name, (prompt, context) in tasks.items():
+        cached = get_cached_openai_response(prompt, context)
+        if cached is not None:
+            results[name] = cached
+        else:
+            pending[name] = (prompt, context)
+    if len(pending) > 1:
+        try:
+            started = time.monotonic()
+            response = ai_client.chat_completion(
+                model=OPENAI_MODEL,
+                messages=_insights_messages(pending),
+                response_format={"type": "json_object"},
+                timeout=timeout
+            )
+            parsed = _parse_insights(response.choices[0].message.content, pending)
+            # Latencia y tokens se reparten entre las tareas para no inflar lo que ahorra la caché
+            latency = (time.monotonic() - started) / len(pending)
+            tokens = (getattr(getattr(response, 'usage', None), 'total_tokens', 0) or 0) // len(pending)
+            for name, text in parsed.items():
+                prompt, context = pending.pop(name)
+                _ai_cache.set(AIResponseCache.key(OPENAI_MODEL, SYSTEM_PROMPT, prompt, context), text, latency, tokens)
+                results[name] = text
+            if pending:
+                logging.warning(f"La respuesta multi-insight no incluyó {list(pending)}; se piden por separado.")
+        except Exception as e:
+            logging.warning(f"No se pudo obtener o interpretar la respuesta multi-insight de OpenAI: {e}. Se piden por separado.")
+    if fallback:
+        for name, (prompt, context) in pending.items():
+            results[name] = get_openai_response(prompt, context, timeout)
+    return results
+
+def chat_cache_key(messages):
+    """Clave de caché de una conversación completa (lista de mensajes con rol)."""
+    return AIResponseCache.key(OPENAI_MODEL, SYSTEM_PROMPT, json.dumps(messages, ensure_ascii=False), 'chat')
+
+def get_cached_chat_response(cache_key):
+    return _ai_cache.get(cache_key)
+
+def stream_openai_response(messages, timeout=None):
+    """Respuesta a una lista de mensajes entregada a medida que OpenAI la genera (stream=True)."""
+    cache_key = chat_cache_key(messages)
+    cached = _ai_cache.get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    try:
+        started = time.monotonic()
+        stream = ai_client.chat_completion(
+            model=OPENAI_MODEL,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=timeout
+        )
+        for chunk in stream:
+            if getattr(chunk, 'usage', None):
+                ai_client.record_usage(chunk.usage, estimate_tokens(messages))
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+        text = "".join(parts).strip()
+        if text:
+            _ai_cache.set(cache_key, text, time.monotonic() - started)
+    except Exception as e:
+        logging.error(f"Error llamando a OpenAI (stream): {e}")
+        separator = "\n" if parts else ""
+        yield f"{separator}Hubo un error al contactar al asistente de IA: {e}. ¿Está bien configurada la API Key?"
+
+def ai_cache_stats():
+    return _ai_cache.stats()
\ No newline at end of file
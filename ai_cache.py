@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import closing
+
+from cache import TTLLRUCache
+
+
+class AIResponseCache:
+    """Respuestas de OpenAI por hash de (modelo, prompts, contexto), en memoria y opcionalmente en SQLite (`path`)."""
+
+    PRUNE_INTERVAL = 60
+
+    def __init__(self, ttl, max_bytes, path=None, max_rows=10000):
+        self.ttl = ttl
+        self.path = path
+        self.max_rows = max_rows
+        self._last_prune = 0.0
+        self._memory = TTLLRUCache(max_bytes, sizeof=lambda entry: len(entry[0].encode('utf-8')) + 64)
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+        if path:
+            self._init_disk()
+
+    @staticmethod
+    def key(model, system_prompt, prompt, context):
+        payload = json.dumps([model, system_prompt, prompt, context], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _connect(self):
+        """Conexión a la base; usar como `with closing(self._connect()) as conn, conn:` (confirma y cierra)."""
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _init_disk(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with closing(self._connect()) as conn, conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS ai_cache (key TEXT PRIMARY KEY, response TEXT, latency REAL, tokens INTEGER, expires_at REAL)")
+                conn.execute("DELETE FROM ai_cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logging.warning(f"No se pudo abrir la caché de IA en disco {self.path}: {e}. Se usa solo memoria.")
+            self.path = None
+
+    def _disk_get(self, key):
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute("SELECT response, latency, tokens, expires_at FROM ai_cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Error leyendo la caché de IA en disco: {e}")
+            return None
+        if row is None or row[3] <= time.time():
+            return None
+        return row
+
+    def _disk_set(self, key, entry, ttl):
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO ai_cache VALUES (?, ?, ?, ?, ?)", (key, entry[0], entry[1], entry[2], time.time() + ttl))
+                if time.time() - self._last_prune > self.PRUNE_INTERVAL:
+                    self._last_prune = time.time()
+                    conn.execute("DELETE FROM ai_cache WHERE expires_at <= ?", (time.time(),))
+                    conn.execute(
+                        "DELETE FROM ai_cache WHERE key IN (SELECT key FROM ai_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_rows,),
+                    )
+        except sqlite3.Error as e:
+            logging.warning(f"Error guardando en la caché de IA en disco: {e}")
+
+    def get(self, key):
+        """Texto cacheado para `key` o None."""
+        entry = self._memory.get(key)
+        if entry is None and self.path:
+            row = self._disk_get(key)
+            if row is not None:
+                entry = (row[0], row[1], row[2])
+                self._memory.set(key, entry, max(0.0, row[3] - time.time()))
+                with self._lock:
+                    self.disk_hits += 1
+        if entry is None:
+            return None
+        with self._lock:
+            self.saved_seconds += entry[1]
+            self.saved_tokens += entry[2]
+        return entry[0]
+
+    def set(self, key, response, latency, tokens=0):
+        entry = (response, latency, tokens or 0)
+        self._memory.set(key, entry, self.ttl)
+        if self.path:
+            self._disk_set(key, entry, self.ttl)
+
+    def stats(self):
+        stats = self._memory.stats()
+        with self._lock:
+            stats.update({
+                'disk_path': self.path,
+                'disk_hits': self.disk_hits,
+                'saved_latency_s': round(self.saved_seconds, 2),
+                'saved_tokens': self.saved_tokens,
+            })
+        return stats
@@ -0,0 +1,201 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+
+from dash import html, Input, Output, State, Patch, no_update
+
+from config import AI_REQUEST_TIMEOUT, CHAT_STORE_PATH, CHAT_HISTORY_DAYS, CHAT_CONTEXT_TOKENS
+from ai import SYSTEM_PROMPT, stream_openai_response, chat_cache_key, get_cached_chat_response, get_openai_response
+from chat_store import ChatStore, estimate_text_tokens
+
+AI_CHAT_PENDING_TEXT = "▌"
+_MAX_STREAMS = 256
+
+_lock = threading.Lock()
+_streams = OrderedDict()
+_stats = {'started': 0, 'completed': 0, 'first_token_ms_total': 0.0, 'first_token_count': 0}
+_chat_store = ChatStore(CHAT_STORE_PATH or None, max_age_days=CHAT_HISTORY_DAYS)
+
+
+def new_chat_session_id():
+    return uuid.uuid4().hex
+
+
+def chat_user_entry(text):
+    return html.P([html.B("Tú: ", style={'color': '#007bff'}), text], style={'margin': '5px 0'})
+
+
+def chat_ai_entry(text):
+    return html.P([html.B("SkyIntel AI: ", style={'color': '#28a745'}), text], style={'background': '#f0f0f0', 'padding': '8px', 'borderRadius': '5px', 'margin': '5px 0'})
+
+
+def build_chat_messages(session_id, tab_id, question, tab_context):
+    """Mensajes para OpenAI: contexto de la pestaña, resumen acumulado y los turnos recientes que caben en CHAT_CONTEXT_TOKENS."""
+    system = f"{SYSTEM_PROMPT}\n{tab_context}"
+    budget = CHAT_CONTEXT_TOKENS - estimate_text_tokens(system) - estimate_text_tokens(question)
+    summary, recent, _ = _chat_store.window(session_id, tab_id, budget)
+    if summary:
+        system += f"\nResumen de la conversación previa: {summary}"
+    return [{'role': 'system', 'content': system}] + [{'role': m['role'], 'content': m['content']} for m in recent] + [{'role': 'user', 'content': question}]
+
+
+def _summarize_overflow(session_id, tab_id):
+    """Incorpora al resumen acumulado los turnos que ya no caben en la ventana de contexto."""
+    summary, _, overflow = _chat_store.window(session_id, tab_id, CHAT_CONTEXT_TOKENS // 2)
+    if not overflow:
+        return
+    turns = "\n".join(f"{'Usuario' if m['role'] == 'user' else 'Asistente'}: {m['content']}" for m in overflow)
+    new_summary = get_openai_response(
+        "Actualiza el resumen de la conversación en un máximo de 5 frases, conservando datos, cifras y decisiones relevantes.",
+        f"Resumen previo: {summary or '(vacío)'}\n\nNuevos turnos:\n{turns}",
+        AI_REQUEST_TIMEOUT
+    )
+    if new_summary.startswith("Hubo un error"):
+        return
+    _chat_store.set_summary(session_id, tab_id, new_summary, overflow[-1]['seq'])
+
+
+def _consume(stream_id, session_id, tab_id, messages):
+    buffer = _streams[stream_id]
+    try:
+        for delta in stream_openai_response(messages, AI_REQUEST_TIMEOUT):
+            with _lock:
+                if not buffer['text']:
+                    _stats['first_token_ms_total'] += (time.monotonic() - buffer['started']) * 1000
+                    _stats['first_token_count'] += 1
+                buffer['text'] += delta
+    except Exception as e:
+        logging.error(f"Error en el stream del chat IA: {e}")
+        with _lock:
+            buffer['text'] += f"\nHubo un error al contactar al asistente de IA: {e}."
+    finally:
+        with _lock:
+            buffer['done'] = True
+            _stats['completed'] += 1
+    _chat_store.append(session_id, tab_id, 'assistant', buffer['text'].strip())
+    try:
+        _summarize_overflow(session_id, tab_id)
+    except Exception as e:
+        logging.warning(f"No se pudo actualizar el resumen del chat: {e}")
+
+
+def start_chat_stream(session_id, tab_id, question, tab_context, count):
+    """Guarda la pregunta, lanza la respuesta en streaming y devuelve el dict para el dcc.Store `{tab}-chat-stream`.
+
+    `count` es el número de entradas que ya muestra `{tab}-chat-history` en el navegador; la de
+    la IA queda en `count + 1` y el callback de consulta la va reemplazando con el texto recibido.
+    """
+    messages = build_chat_messages(session_id, tab_id, question, tab_context)
+    _chat_store.append(session_id, tab_id, 'user', question)
+    stream_id = uuid.uuid4().hex
+    with _lock:
+        _streams[stream_id] = {'text': '', 'done': False, 'started': time.monotonic()}
+        _stats['started'] += 1
+        while len(_streams) > _MAX_STREAMS:
+            _streams.popitem(last=False)
+    threading.Thread(target=_consume, args=(stream_id, session_id, tab_id, messages), name='ai-chat-stream', daemon=True).start()
+    return {'id': stream_id, 'index': count + 1, 'count': count + 2, 'shown': 0, 'cache_key': chat_cache_key(messages), 'started_at': time.time()}
+
+
+def read_chat_stream(stream):
+    """(texto acumulado, terminado) del stream descrito por el dcc.Store."""
+    with _lock:
+        buffer = _streams.get(stream['id'])
+        if buffer is not None:
+            return buffer['text'], buffer['done']
+    # El stream corre en otro worker de gunicorn: cuando termine, su respuesta estará en la caché de IA en disco.
+    cached = get_cached_chat_response(stream['cache_key'])
+    if cached is not None:
+        return cached, True
+    if time.time() - stream['started_at'] > 2 * AI_REQUEST_TIMEOUT:
+        return "La respuesta de la IA no llegó a tiempo. Inténtalo de nuevo.", True
+    return '', False
+
+
+def register_chat_callbacks(app, tab_id, subtabs_id, section_label):
+    """Registra el chat de `tab_id`: el envío de preguntas y la consulta que va pintando la respuesta en curso.
+
+    El historial vive en el servidor (`ChatStore`); el navegador solo recibe las entradas nuevas
+    como `Patch` y no reenvía `{tab_id}-chat-history` en cada mensaje. Mientras una respuesta
+    está en curso el campo y el botón de envío quedan deshabilitados, así cada pregunta nueva
+    incluye la respuesta anterior completa en su historial. Cada vez que la vista vuelve a crear
+    el panel, se rellena con la conversación guardada para que coincida con lo que ve el modelo.
+    """
+    @app.callback(
+        Output(f'{tab_id}-chat-history', 'children', allow_duplicate=True),
+        Output(f'{tab_id}-chat-stream', 'data', allow_duplicate=True),
+        Input(f'{tab_id}-chat-history', 'id'),
+        State('chat-session-id', 'data'),
+        prevent_initial_call='initial_duplicate'
+    )
+    def restore_chat_history(_, session_id):
+        messages = _chat_store.history(session_id, tab_id) if session_id else []
+        if not messages:
+            return no_update, no_update
+        entries = [chat_user_entry(content) if role == 'user' else chat_ai_entry(content) for role, content in messages]
+        return entries, {'count': len(entries), 'done': True}
+
+    @app.callback(
+        Output(f'{tab_id}-chat-history', 'children'),
+        Output(f'{tab_id}-chat-stream', 'data'),
+        Output(f'{tab_id}-chat-stream-poll', 'disabled'),
+        Output('chat-session-id', 'data', allow_duplicate=True),
+        Output(f'{tab_id}-chat-submit', 'disabled'),
+        Output(f'{tab_id}-chat-input', 'disabled'),
+        Input(f'{tab_id}-chat-submit', 'n_clicks'),
+        State(f'{tab_id}-chat-input', 'value'),
+        State(f'{tab_id}-chat-stream', 'data'),
+        State(subtabs_id, 'value'),
+        State('chat-session-id', 'data'),
+        prevent_initial_call=True
+    )
+    def update_chat(n_clicks, user_input, stream, current_tab_value, session_id):
+        if not n_clicks or not user_input: return (no_update,) * 6
+        if stream and not stream.get('done'): return (no_update,) * 6
+        new_session = not session_id
+        if new_session: session_id = new_chat_session_id()
+
+        context = f"Estás en la pestaña '{tab_id}' (sub-pestaña actual de {section_label}: {current_tab_value}). El usuario tiene una pregunta."
+        # La respuesta llega en streaming: se deja una entrada vacía que `update_chat_stream` va rellenando
+        stream = start_chat_stream(session_id, tab_id, user_input, context, count=(stream or {}).get('count', 0))
+
+        history = Patch()
+        history.append(chat_user_entry(user_input))
+        history.append(chat_ai_entry(AI_CHAT_PENDING_TEXT))
+        return history, stream, False, session_id if new_session else no_update, True, True
+
+    @app.callback(
+        Output(f'{tab_id}-chat-history', 'children', allow_duplicate=True),
+        Output(f'{tab_id}-chat-stream', 'data', allow_duplicate=True),
+        Output(f'{tab_id}-chat-stream-poll', 'disabled', allow_duplicate=True),
+        Output(f'{tab_id}-chat-submit', 'disabled', allow_duplicate=True),
+        Output(f'{tab_id}-chat-input', 'disabled', allow_duplicate=True),
+        Input(f'{tab_id}-chat-stream-poll', 'n_intervals'),
+        State(f'{tab_id}-chat-stream', 'data'),
+        prevent_initial_call=True
+    )
+    def update_chat_stream(n_intervals, stream):
+        if not stream or stream.get('done'):
+            return no_update, no_update, True, False, False
+        text, done = read_chat_stream(stream)
+        if len(text) == stream['shown'] and not done:
+            return (no_update,) * 5
+        history = Patch()
+        history[stream['index']] = chat_ai_entry(text if done else text + AI_CHAT_PENDING_TEXT)
+        if done:
+            return history, dict(stream, shown=len(text), done=True), True, False, False
+        return history, dict(stream, shown=len(text)), False, no_update, no_update
+
+
+def ai_chat_stats():
+    with _lock:
+        count = _stats['first_token_count']
+        stats = {
+            'streams_started': _stats['started'],
+            'streams_completed': _stats['completed'],
+            'avg_time_to_first_token_ms': round(_stats['first_token_ms_total'] / count, 1) if count else None,
+        }
+    stats['store'] = _chat_store.stats()
+    return stats
@@ -0,0 +1,220 @@
+import time
+import random
+import logging
+import threading
+
+import openai
+
+from config import OPENAI_API_KEY, AI_REQUEST_TIMEOUT, AI_MAX_RETRIES, AI_MAX_CONCURRENCY, OPENAI_RPM_LIMIT, OPENAI_TPM_LIMIT
+from process_local import ProcessLocal
+
+_RETRY_BASE_SECONDS = 0.5
+_RETRY_MAX_SECONDS = 20.0
+_COMPLETION_TOKENS_ESTIMATE = 500
+
+
+class AICapacityTimeout(TimeoutError):
+    """No hubo hueco de concurrencia ni fichas para llamar a OpenAI dentro del timeout de la llamada."""
+
+
+class TokenBucket:
+    """Cubeta de fichas que se rellena a `per_minute` fichas por minuto (hasta `per_minute`)."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self._rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(self, amount=1, timeout=None):
+        """Bloquea hasta poder consumir `amount` fichas; devuelve los segundos esperados (None, sin consumir, si pasarían de `timeout`)."""
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self._rate
+            if timeout is not None and waited + delay > timeout:
+                return None
+            time.sleep(delay)
+            waited += delay
+
+    def adjust(self, amount):
+        """Descuenta (o devuelve, si es negativo) fichas tras conocer el consumo real; puede quedar en negativo."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+def estimate_tokens(messages):
+    """Tokens aproximados de una petición (≈4 caracteres por token más una respuesta típica)."""
+    return sum(len(m.get('content') or '') for m in messages) // 4 + _COMPLETION_TOKENS_ESTIMATE
+
+
+def _is_retryable(error):
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_delay(error, attempt):
+    """Espera antes del reintento: el Retry-After de OpenAI si lo envía, si no backoff exponencial con jitter completo."""
+    response = getattr(error, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), _RETRY_MAX_SECONDS)
+    except ValueError:
+        pass
+    return random.uniform(0, min(_RETRY_MAX_SECONDS, _RETRY_BASE_SECONDS * 2 ** attempt))
+
+
+class _SlotStream:
+    """Stream del SDK que ocupa su hueco de concurrencia hasta agotarse, fallar o cerrarse."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+        self._released = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self.close()
+
+    def close(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._release()
+        close = getattr(self._stream, 'close', None)
+        if close is not None:
+            close()
+
+    def __del__(self):
+        self.close()
+
+
+class OpenAIClient:
+    """Cliente OpenAI compartido por el proceso, limitado por cubetas de peticiones y tokens por minuto y por llamadas simultáneas."""
+
+    def __init__(self, api_key, timeout, max_retries, max_concurrency, rpm_limit, tpm_limit):
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._requests_bucket = TokenBucket(rpm_limit)
+        self._tokens_bucket = TokenBucket(tpm_limit)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._client = ProcessLocal(lambda: openai.OpenAI(api_key=self.api_key, timeout=self.timeout, max_retries=0))
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0, 'retries': 0, 'rate_limited': 0, 'failures': 0, 'capacity_timeouts': 0,
+            'queue_wait_s': 0.0, 'max_queue_wait_s': 0.0,
+            'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0,
+        }
+
+    def _get_client(self):
+        """Instancia del SDK del proceso; se recrea tras un fork porque el pool de conexiones no se hereda."""
+        return self._client.get()
+
+    def _wait_for_capacity(self, estimated_tokens, timeout):
+        """Ocupa primero un hueco de concurrencia y después las fichas, todo en `timeout` segundos; si no llega, devuelve lo reservado."""
+        started = time.monotonic()
+        remaining = lambda: max(0.0, timeout - (time.monotonic() - started))
+        acquired = self._slots.acquire(timeout=timeout)
+        if acquired and self._requests_bucket.acquire(1, timeout=remaining()) is None:
+            self._slots.release()
+            acquired = False
+        elif acquired and self._tokens_bucket.acquire(estimated_tokens, timeout=remaining()) is None:
+            self._requests_bucket.adjust(-1)
+            self._slots.release()
+            acquired = False
+        if not acquired:
+            with self._lock:
+                self._stats['capacity_timeouts'] += 1
+                self._stats['failures'] += 1
+            raise AICapacityTimeout(f"Sin capacidad para llamar a OpenAI en {timeout:g}s (concurrencia o límites por minuto)")
+        return time.monotonic() - started
+
+    def record_usage(self, usage, estimated_tokens):
+        """Suma el consumo real (`usage` de la respuesta) y corrige la reserva hecha en la cubeta de tokens."""
+        total = getattr(usage, 'total_tokens', None) or 0
+        if total:
+            self._tokens_bucket.adjust(total - estimated_tokens)
+        with self._lock:
+            self._stats['prompt_tokens'] += getattr(usage, 'prompt_tokens', None) or 0
+            self._stats['completion_tokens'] += getattr(usage, 'completion_tokens', None) or 0
+            self._stats['total_tokens'] += total
+
+    def chat_completion(self, messages, timeout=None, **kwargs):
+        """`chat.completions.create` con control de ritmo, timeout y reintentos.
+
+        Con `stream=True` devuelve el stream del SDK, que cuenta contra AI_MAX_CONCURRENCY hasta
+        que se agota o se cierra; el consumo se registra al leer el último fragmento
+        (`record_usage`) y los reintentos solo cubren la apertura del stream. Los intentos fallidos
+        devuelven a la cubeta los tokens que habían reservado. Si en `timeout` segundos no hay hueco
+        ni fichas se lanza AICapacityTimeout.
+        """
+        estimated_tokens = estimate_tokens(messages)
+        timeout = timeout or self.timeout
+        attempt = 0
+        while True:
+            waited = self._wait_for_capacity(estimated_tokens, timeout)
+            with self._lock:
+                self._stats['requests'] += 1
+                self._stats['queue_wait_s'] += waited
+                self._stats['max_queue_wait_s'] = max(self._stats['max_queue_wait_s'], waited)
+            try:
+                response = self._get_client().chat.completions.create(messages=messages, timeout=timeout, **kwargs)
+            except Exception as e:
+                self._slots.release()
+                self._tokens_bucket.adjust(-estimated_tokens)
+                if isinstance(e, openai.RateLimitError):
+                    with self._lock:
+                        self._stats['rate_limited'] += 1
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    with self._lock:
+                        self._stats['failures'] += 1
+                    raise
+                delay = _retry_delay(e, attempt)
+                attempt += 1
+                with self._lock:
+                    self._stats['retries'] += 1
+                logging.warning(f"OpenAI falló ({type(e).__name__}); reintento {attempt}/{self.max_retries} en {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if kwargs.get('stream'):
+                return _SlotStream(response, self._slots.release)
+            self._slots.release()
+            self.record_usage(getattr(response, 'usage', None), estimated_tokens)
+            return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['avg_queue_wait_ms'] = round(stats['queue_wait_s'] / stats['requests'] * 1000, 1) if stats['requests'] else 0.0
+        stats['queue_wait_s'] = round(stats['queue_wait_s'], 3)
+        stats['max_queue_wait_s'] = round(stats['max_queue_wait_s'], 3)
+        return stats
+
+
+ai_client = OpenAIClient(
+    api_key=OPENAI_API_KEY, timeout=AI_REQUEST_TIMEOUT, max_retries=AI_MAX_RETRIES,
+    max_concurrency=AI_MAX_CONCURRENCY, rpm_limit=OPENAI_RPM_LIMIT, tpm_limit=OPENAI_TPM_LIMIT,
+)
+
+
+def ai_client_stats():
+    return ai_client.stats()
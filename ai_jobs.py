@@ -0,0 +1,207 @@
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from dash import Input, Output, State, no_update
+
+from config import AI_MAX_WORKERS, AI_INSIGHT_MAX_POLLS, AI_REQUEST_TIMEOUT, AI_RENDER_BUDGET, AI_RENDER_HEDGE_AFTER, AI_INSIGHT_RESUBMIT_AFTER
+from ai import OPENAI_MODEL, SYSTEM_PROMPT, get_openai_response, get_openai_insights, get_cached_openai_response
+from ai_cache import AIResponseCache
+from process_local import ProcessLocal
+
+AI_INSIGHT_PENDING_TEXT = "⏳ Generando análisis IA..."
+AI_INSIGHT_TIMEOUT_TEXT = "El análisis IA está tardando más de lo esperado. Vuelve a abrir la pestaña en unos minutos."
+AI_INSIGHT_LATE_TEXT = "El análisis IA sigue generándose; estará disponible al actualizar los filtros."
+_MAX_JOBS = 512
+
+InsightJob = namedtuple('InsightJob', ['job_id', 'prompt', 'context', 'submitted_at'])
+
+_lock = threading.Lock()
+_executor = ProcessLocal(lambda: ThreadPoolExecutor(max_workers=AI_MAX_WORKERS, thread_name_prefix='ai-insight'))
+_background_executor = ProcessLocal(lambda: ThreadPoolExecutor(max_workers=1, thread_name_prefix='ai-background'))
+# Trabajos en curso del proceso (los futures heredados tras un fork no terminan nunca)
+_jobs = ProcessLocal(OrderedDict)
+_background_jobs = ProcessLocal(set)
+_stats = {'submitted': 0, 'submitted_background': 0, 'deduplicated': 0, 'resubmitted': 0, 'served_from_cache': 0, 'resolved_from_cache': 0, 'late': 0}
+
+# True dentro de `ai_background()`: las llamadas van al pool de baja prioridad (pre-calentado)
+_background = contextvars.ContextVar('ai_background', default=False)
+
+
+@contextmanager
+def ai_background():
+    """Los insights lanzados dentro del bloque van a un pool propio de un hilo y no retrasan los de los usuarios."""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+def wait_background_ai(timeout=None):
+    """Espera a que terminen los insights lanzados en segundo plano por este proceso."""
+    with _lock:
+        pending = [future for future in _background_jobs.get() if not future.done()]
+    wait(pending, timeout=timeout)
+
+
+def _submit_call(job_id, fn, *args):
+    background = _background.get()
+    with _lock:
+        jobs = _jobs.get()
+        future = jobs.get(job_id)
+        if future is not None and not future.done():
+            _stats['deduplicated'] += 1
+            return future
+        future = (_background_executor if background else _executor).get().submit(fn, *args)
+        jobs[job_id] = future
+        jobs.move_to_end(job_id)
+        if background:
+            background_jobs = _background_jobs.get()
+            background_jobs.add(future)
+            future.add_done_callback(background_jobs.discard)
+            _stats['submitted_background'] += 1
+        else:
+            _stats['submitted'] += 1
+        while len(jobs) > _MAX_JOBS:
+            jobs.popitem(last=False)
+        return future
+
+
+def _submit(job_id, prompt, context):
+    return _submit_call(job_id, get_openai_response, prompt, context, AI_REQUEST_TIMEOUT)
+
+
+def submit_ai_insight(prompt, context=""):
+    """Lanza en segundo plano la generación de un insight.
+
+    Si la respuesta ya está en la caché de IA se devuelve el texto directamente; si no, un
+    `InsightJob` que la vista pinta con `create_ai_insight_data` y el navegador consulta hasta
+    que termina. Dos peticiones con el mismo prompt y contexto comparten el mismo trabajo.
+    """
+    cached = get_cached_openai_response(prompt, context)
+    if cached is not None:
+        with _lock:
+            _stats['served_from_cache'] += 1
+        return cached
+    job_id = AIResponseCache.key(OPENAI_MODEL, SYSTEM_PROMPT, prompt, context)
+    _submit(job_id, prompt, context)
+    return InsightJob(job_id, prompt, context, time.time())
+
+
+def poll_ai_insight(job):
+    """Texto del insight si ya terminó, o None. `job` es el dict guardado en el dcc.Store de la vista."""
+    with _lock:
+        future = _jobs.get().get(job['job_id'])
+    if future is None:
+        # El trabajo se lanzó en otro worker de gunicorn (o ya se descartó): su respuesta llega
+        # por la caché de IA compartida. Solo se relanza aquí si tarda más de lo que puede durar
+        # la llamada original (p. ej. el worker que la hacía murió).
+        text = get_cached_openai_response(job['prompt'], job['context'])
+        if text is not None:
+            with _lock:
+                _stats['resolved_from_cache'] += 1
+            return text
+        if time.time() - job.get('submitted_at', 0) < AI_INSIGHT_RESUBMIT_AFTER:
+            return None
+        with _lock:
+            _stats['resubmitted'] += 1
+        future = _submit(job['job_id'], job['prompt'], job['context'])
+    if not future.done():
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        logging.error(f"Error generando insight IA en segundo plano: {e}")
+        return f"Hubo un error al generar el análisis IA: {e}"
+
+
+def run_ai_tasks(tasks, budget=AI_RENDER_BUDGET, fallback=AI_INSIGHT_LATE_TEXT, hedge_after=AI_RENDER_HEDGE_AFTER):
+    """Genera varios insights independientes con un presupuesto de tiempo común.
+
+    `tasks` es un dict nombre -> (prompt, contexto). Primero se piden todos juntos en una sola
+    llamada con respuesta JSON (`get_openai_insights`). Si no responde en `hedge_after` segundos,
+    o no resuelve alguna tarea, las que falten se piden además por separado y en paralelo, y cada
+    una toma la primera respuesta que llegue. Lo que no termine antes de `budget` segundos se
+    devuelve como `fallback`; esas llamadas siguen en segundo plano y dejan su respuesta en la
+    caché de IA.
+    """
+    if not tasks:
+        return {}
+    started = time.monotonic()
+    results = {}
+    pending = set()
+    combined = None
+    if len(tasks) > 1:
+        job_id = AIResponseCache.key(OPENAI_MODEL, SYSTEM_PROMPT, 'insights', json.dumps(tasks, sort_keys=True, ensure_ascii=False))
+        combined = _submit_call(job_id, get_openai_insights, tasks, AI_REQUEST_TIMEOUT, False)
+        pending.add(combined)
+        wait([combined], timeout=min(hedge_after, budget))
+
+    futures = {}
+    while True:
+        if combined in pending and combined.done():
+            pending.discard(combined)
+            if combined.exception() is None:
+                results.update((name, text) for name, text in combined.result().items() if name not in results)
+            else:
+                logging.error(f"Error en la petición multi-insight: {combined.exception()}")
+        for name, future in list(futures.items()):
+            if future.done() and name not in results and future.exception() is None:
+                results[name] = future.result()
+        if not futures:
+            # Se piden por separado las tareas que la llamada conjunta no resolvió (o todas, si aún no respondió)
+            futures = {name: _submit(AIResponseCache.key(OPENAI_MODEL, SYSTEM_PROMPT, prompt, context), prompt, context) for name, (prompt, context) in tasks.items() if name not in results}
+            pending.update(futures.values())
+        pending = {future for future in pending if not future.done()}
+        unresolved = [name for name in tasks if name not in results and (combined in pending or not futures[name].done())]
+        remaining = budget - (time.monotonic() - started)
+        if not unresolved or remaining <= 0:
+            break
+        wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+    for name in tasks:
+        if name in results:
+            continue
+        future = futures[name]
+        if not future.done():
+            logging.warning(f"Insight IA '{name}' no terminó en {budget}s; se devuelve texto por defecto.")
+            with _lock:
+                _stats['late'] += 1
+        else:
+            logging.error(f"Error en insight IA '{name}': {future.exception()}")
+        results[name] = fallback
+    logging.info(f"{len(tasks)} insights IA en paralelo completados en {time.monotonic() - started:.2f}s")
+    return results
+
+
+def register_ai_insight_poll(app, prefix):
+    """Registra el callback que rellena `{prefix}-ai-insight-data` cuando termina su trabajo en segundo plano."""
+    @app.callback(
+        Output(f'{prefix}-ai-insight-data', 'children'),
+        Output(f'{prefix}-ai-insight-poll', 'disabled'),
+        Input(f'{prefix}-ai-insight-poll', 'n_intervals'),
+        State(f'{prefix}-ai-insight-job', 'data'),
+        prevent_initial_call=True
+    )
+    def update_ai_insight_from_job(n_intervals, job):
+        if not job:
+            return no_update, True
+        text = poll_ai_insight(job)
+        if text is not None:
+            return text, True
+        if n_intervals and n_intervals >= AI_INSIGHT_MAX_POLLS:
+            return AI_INSIGHT_TIMEOUT_TEXT, True
+        return no_update, no_update
+
+
+def ai_jobs_stats():
+    with _lock:
+        jobs = _jobs.get()
+        pending = sum(1 for f in jobs.values() if not f.done())
+        return dict(_stats, pending=pending, tracked=len(jobs))
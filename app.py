@@ -1,13 +1,28 @@
+import time
+_import_started = time.perf_counter()
+
 import dash
 import dash_bootstrap_components as dbc
 from dash import html, dcc
 import base64
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 # Dependencias de tu proyecto
 from config import LOGO_PATH
-from utils import query_ga
+from date_bounds import initial_bounds, start_bounds_warmup
+from ga_client import ga_client_stats
+from ga_store import ga_store_stats
+from ai import ai_cache_stats
+from ai_client import ai_client_stats
+from ai_jobs import ai_jobs_stats
+from ai_chat import ai_chat_stats
+from graph_api import graph_api_stats
+from social_store import social_store_stats
+from post_insights import post_insights_stats
+from utils import ga_cache_stats
+from instrumentation import register_stats_provider, register_instrumentation_routes
+from prewarm import start_prewarm_scheduler, prewarm_stats
 # Módulos refactorizados
 from layout_components import create_ops_sales_layout, create_web_social_layout
 from ops_sales import register_ops_sales_callbacks
@@ -17,24 +32,12 @@ app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_
 app.title = "SkyIntel Dashboard"
 
 # --- Lógica de inicialización (ej. fechas para el DatePicker) ---
-START_DATE_GLOBAL = '2023-01-01'
-END_DATE_GLOBAL = 'today'
-try:
-    df_acquisition_init = query_ga(metrics=['sessions'], dimensions=['date'], start_date=START_DATE_GLOBAL, end_date=END_DATE_GLOBAL)
-    if not df_acquisition_init.empty:
-        df_acquisition_init.rename(columns={'date': 'Fecha'}, inplace=True)
-        min_date_allowed = df_acquisition_init['Fecha'].min().date()
-        max_date_allowed = df_acquisition_init['Fecha'].max().date()
-        start_date_val = (max_date_allowed - timedelta(days=30))
-        end_date_val = max_date_allowed
-    else:
-        raise ValueError("No initial data for DatePicker")
-except Exception as e:
-    logging.warning(f"Could not load initial dates for DatePicker from GA4: {e}. Using default past year.")
-    min_date_allowed = (datetime.now() - timedelta(days=365)).date()
-    max_date_allowed = datetime.now().date()
-    start_date_val = (max_date_allowed - timedelta(days=30))
-    end_date_val = max_date_allowed
+# El layout se arma con los límites guardados (o el último año) sin esperar a GA4; los límites reales
+# se consultan en segundo plano y el callback de 'date-bounds-poll' actualiza el DatePicker.
+min_date_allowed, max_date_allowed = initial_bounds()
+start_date_val = (max_date_allowed - timedelta(days=30))
+end_date_val = max_date_allowed
+start_bounds_warmup()
 logging.info(f"DatePicker initialized: min={min_date_allowed}, max={max_date_allowed}, start={start_date_val}, end={end_date_val}")
 
 
@@ -49,6 +52,7 @@ except (FileNotFoundError, TypeError):
 
 # --- Layout Principal de la App ---
 app.layout = dbc.Container([
+    dcc.Store(id='chat-session-id', storage_type='session'),
     dbc.Row([
         dbc.Col(html.Img(src=logo_src, style={'height': '100px', 'margin': '10px'}), width='auto'),
         dbc.Col(html.H1('SkyIntel Dashboard – AI Insights', style={'textAlign': 'center', 'color': '#002859', 'fontWeight': 'bold', 'paddingTop': '20px'}), width=True),
@@ -65,6 +69,25 @@ register_ops_sales_callbacks(app)
 register_web_social_callbacks(app)
 
 
+# --- Instrumentación (GET /_instrumentation) ---
+startup_stats = {'import_to_ready_ms': round((time.perf_counter() - _import_started) * 1000, 1)}
+register_stats_provider('startup', lambda: startup_stats)
+register_stats_provider('ga_client', ga_client_stats)
+register_stats_provider('ga_cache', ga_cache_stats)
+register_stats_provider('ga_store', ga_store_stats)
+register_stats_provider('ai_client', ai_client_stats)
+register_stats_provider('ai_cache', ai_cache_stats)
+register_stats_provider('ai_jobs', ai_jobs_stats)
+register_stats_provider('ai_chat', ai_chat_stats)
+register_stats_provider('graph_api', graph_api_stats)
+register_stats_provider('social_store', social_store_stats)
+register_stats_provider('post_insights', post_insights_stats)
+register_stats_provider('prewarm', prewarm_stats)
+register_instrumentation_routes(app.server)
+start_prewarm_scheduler(app.server)
+logging.info(f"app.py listo en {startup_stats['import_to_ready_ms']} ms (import -> layout y callbacks registrados)")
+
+
 # --- Ejecución de la App ---
 if __name__ == '__main__':
     app.run(debug=True, port=8052)
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""Micro-benchmark: decodificación de RunReportResponse de GA4 (ruta anterior vs. columnar).
+
+Uso: python benchmarks/bench_ga_parse.py [filas]
+"""
+import os
+import sys
+import time
+import pandas as pd
+from google.analytics.data_v1beta.types import RunReportResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import _columns_to_df, _response_columns  # noqa: E402
+
+METRICS = ['sessions', 'activeUsers', 'bounceRate', 'averageSessionDuration']
+DIMENSIONS = ['date', 'pagePath']
+
+
+def build_response(n_rows):
+    """Respuesta sintética con 2 dimensiones y 4 métricas (2 enteras, 2 decimales)."""
+    pb = RunReportResponse.pb()()
+    pb.dimension_headers.add(name='date')
+    pb.dimension_headers.add(name='pagePath')
+    for name, metric_type in zip(METRICS, [1, 1, 2, 4]):
+        pb.metric_headers.add(name=name, type_=metric_type)
+    for i in range(n_rows):
+        row = pb.rows.add()
+        row.dimension_values.add(value=f"2024{(i % 12) + 1:02d}{(i % 28) + 1:02d}")
+        row.dimension_values.add(value=f"/pagina/{i % 5000}")
+        row.metric_values.add(value=str(i % 977))
+        row.metric_values.add(value=str(i % 613))
+        row.metric_values.add(value=f"{(i % 100) / 100:.4f}")
+        row.metric_values.add(value=f"{(i % 3600) * 1.37:.6f}")
+    pb.row_count = n_rows
+    return RunReportResponse.wrap(pb)
+
+
+def legacy_parse(response, metrics, dimensions):
+    """Ruta anterior de query_ga: un dict por fila, float() por valor y to_numeric por columna."""
+    rows = []
+    dim_headers = [d.name for d in response.dimension_headers]
+    metric_headers = [m.name for m in response.metric_headers]
+    for row in response.rows:
+        d_values = {dim_headers[i]: row.dimension_values[i].value for i in range(len(dim_headers))}
+        m_values = {}
+        for i in range(len(metric_headers)):
+            value_str = row.metric_values[i].value
+            try:
+                m_values[metric_headers[i]] = float(value_str)
+            except (ValueError, TypeError):
+                m_values[metric_headers[i]] = 0.0
+        rows.append({**d_values, **m_values})
+    df = pd.DataFrame(rows)
+    df['date'] = pd.to_datetime(df['date'], format='%Y%m%d', errors='coerce')
+    for m in metrics:
+        df[m] = pd.to_numeric(df[m], errors='coerce').fillna(0)
+    return df.dropna(subset=['date'])
+
+
+def columnar_parse(response, metrics, dimensions):
+    return _columns_to_df([_response_columns(response)], metrics, dimensions)
+
+
+def timeit(fn, *args, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    response = build_response(n_rows)
+    t_legacy, df_legacy = timeit(legacy_parse, response, METRICS, DIMENSIONS)
+    t_columnar, df_columnar = timeit(columnar_parse, response, METRICS, DIMENSIONS)
+    pd.testing.assert_frame_equal(df_legacy, df_columnar, check_dtype=False)
+    print(f"filas: {n_rows:,}")
+    print(f"ruta anterior : {t_legacy * 1000:8.1f} ms")
+    print(f"ruta columnar : {t_columnar * 1000:8.1f} ms  ({t_legacy / t_columnar:.1f}x)")
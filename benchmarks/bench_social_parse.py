@@ -0,0 +1,76 @@
+"""Micro-benchmark: procesamiento de publicaciones de Facebook/Instagram (ruta anterior vs. una sola pasada).
+
+Uso: python benchmarks/bench_social_parse.py [publicaciones]
+"""
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_processing import process_facebook_posts, process_instagram_posts  # noqa: E402
+
+
+def build_posts(n_posts):
+    """Publicaciones sintéticas de FB e IG con insights anidados (algunas sin likes/insights)."""
+    fb, ig = [], []
+    for i in range(n_posts):
+        created = f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}T{i % 24:02d}:00:00+0000"
+        post = {'id': f"1_{i}", 'message': f"Publicación {i}", 'created_time': created, 'shares': {'count': i % 7},
+                'comments': {'data': [], 'summary': {'total_count': i % 11}},
+                'insights': {'data': [{'name': 'post_impressions', 'period': 'lifetime', 'values': [{'value': i * 3}]}]}}
+        if i % 5:
+            post['likes'] = {'data': [], 'summary': {'total_count': i % 97}}
+        fb.append(post)
+        media = {'id': str(9000 + i), 'caption': f"Caption {i}", 'media_type': 'VIDEO' if i % 3 == 0 else 'IMAGE',
+                 'media_url': 'https://example.com/m.jpg', 'permalink': f"https://instagram.com/p/{i}", 'thumbnail_url': None,
+                 'timestamp': created, 'username': 'cuenta', 'like_count': i % 89, 'comments_count': i % 13}
+        if i % 4:
+            media['insights'] = {'data': [{'name': name, 'period': 'lifetime', 'values': [{'value': i + k}]}
+                                          for k, name in enumerate(['impressions', 'reach', 'total_interactions', 'video_views'])]}
+        ig.append(media)
+    return fb, ig
+
+
+def legacy_process_facebook_posts(posts):
+    """Ruta anterior: un apply(lambda) por contador."""
+    df = pd.DataFrame(posts)
+    df['likes_count'] = df['likes'].apply(lambda x: x['summary']['total_count'] if isinstance(x, dict) and 'summary' in x else 0)
+    df['comments_count'] = df['comments'].apply(lambda x: x['summary']['total_count'] if isinstance(x, dict) and 'summary' in x else 0)
+    df['shares_count'] = df['shares'].apply(lambda x: x.get('count', 0) if isinstance(x, dict) else 0)
+    df['impressions'] = df['insights'].apply(lambda x: next((item['values'][0]['value'] for item in x.get('data', []) if item.get('name') == 'post_impressions'), 0) if isinstance(x, dict) else 0)
+    df['created_time'] = pd.to_datetime(df['created_time']).dt.tz_localize(None)
+    return df[['id', 'message', 'created_time', 'likes_count', 'comments_count', 'shares_count', 'impressions']]
+
+
+def legacy_process_instagram_posts(posts):
+    """Ruta anterior: cuatro recorridos de `insights` con apply(lambda)."""
+    df = pd.DataFrame(posts)
+    df['impressions'] = df['insights'].apply(lambda x: next((item['values'][0]['value'] for item in x.get('data', []) if item.get('name') == 'impressions'), 0) if isinstance(x, dict) else 0)
+    df['reach'] = df['insights'].apply(lambda x: next((item['values'][0]['value'] for item in x.get('data', []) if item.get('name') == 'reach'), 0) if isinstance(x, dict) else 0)
+    df['engagement'] = df['insights'].apply(lambda x: next((item['values'][0]['value'] for item in x.get('data', []) if item.get('name') == 'total_interactions'), 0) if isinstance(x, dict) else 0)
+    df['video_views'] = df['insights'].apply(lambda x: next((item['values'][0]['value'] for item in x.get('data', []) if item.get('name') == 'video_views'), 0) if isinstance(x, dict) else 0)
+    df['timestamp'] = pd.to_datetime(df['timestamp']).dt.tz_localize(None)
+    return df[['id', 'caption', 'media_type', 'media_url', 'permalink', 'thumbnail_url', 'timestamp', 'username', 'like_count', 'comments_count', 'impressions', 'reach', 'engagement', 'video_views']]
+
+
+def timeit(fn, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    n_posts = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    fb_posts, ig_posts = build_posts(n_posts)
+    print(f"publicaciones: {n_posts:,}")
+    for label, legacy, current, posts in [('Facebook', legacy_process_facebook_posts, process_facebook_posts, fb_posts),
+                                          ('Instagram', legacy_process_instagram_posts, process_instagram_posts, ig_posts)]:
+        t_legacy, df_legacy = timeit(legacy, posts)
+        t_current, df_current = timeit(current, posts)
+        pd.testing.assert_frame_equal(df_legacy, df_current, check_dtype=False)
+        print(f"{label:9} ruta anterior : {t_legacy * 1000:8.1f} ms")
+        print(f"{label:9} una pasada    : {t_current * 1000:8.1f} ms  ({t_legacy / t_current:.1f}x)")
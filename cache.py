@@ -0,0 +1,127 @@
+import os
+import pickle
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLLRUCache:
+    """Caché en memoria segura entre hilos con expiración por entrada y desalojo LRU acotado a `max_bytes`."""
+
+    def __init__(self, max_bytes, sizeof=lambda value: 1):
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Devuelve el valor vigente de `key` (y lo marca como reciente) o `default`."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl):
+        """Guarda `value` durante `ttl` segundos; los valores mayores que la caché no se guardan."""
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._data:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+class SharedPickle:
+    """Valor en memoria respaldado por un pickle opcional en disco, que `get` relee si otro worker lo guardó después."""
+
+    def __init__(self, path=None, default=lambda: None, label='el archivo'):
+        self.path = path
+        self.label = label
+        self._default = default
+        self._value = None
+        self._loaded = False
+        self._mtime = 0.0
+
+    def _disk_mtime(self):
+        try:
+            return os.path.getmtime(self.path) if self.path else 0.0
+        except OSError:
+            return 0.0
+
+    def get(self):
+        mtime = self._disk_mtime()
+        if self._loaded and mtime <= self._mtime:
+            return self._value
+        value = self._default()
+        if mtime:
+            try:
+                with open(self.path, 'rb') as f:
+                    value = pickle.load(f)
+            except Exception as e:
+                logging.warning(f"No se pudo leer {self.label} {self.path}: {e}")
+        self._value, self._loaded, self._mtime = value, True, mtime
+        return value
+
+    def peek(self):
+        """Lo que hay en memoria, sin mirar el disco (None si aún no se cargó)."""
+        return self._value
+
+    def set(self, value):
+        self._value, self._loaded = value, True
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+            self._mtime = self._disk_mtime()
+        except Exception as e:
+            logging.warning(f"No se pudo guardar {self.label} {self.path}: {e}")
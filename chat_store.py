@@ -0,0 +1,101 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+
+def estimate_text_tokens(text):
+    """Tokens aproximados de un texto (≈4 caracteres por token)."""
+    return len(text or '') // 4 + 4
+
+
+class ChatStore:
+    """Mensajes (rol, texto) y resumen acumulado del chat IA por sesión del navegador, en SQLite (`path`) o en memoria."""
+
+    def __init__(self, path=None, max_age_days=7):
+        self.path = path
+        self.max_age_days = max_age_days
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.Lock()
+        self.summaries_generated = 0
+
+    def _connection(self):
+        """Conexión del proceso (se reabre tras un fork); crea las tablas y purga conversaciones antiguas."""
+        if self._conn is not None and self._conn_pid == os.getpid():
+            return self._conn
+        target = self.path or ':memory:'
+        try:
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(target, timeout=5, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            logging.warning(f"No se pudo abrir el almacén de chat {target}: {e}. Se usa solo memoria.")
+            self.path = None
+            conn = sqlite3.connect(':memory:', check_same_thread=False)
+        with conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS chat_messages (seq INTEGER PRIMARY KEY AUTOINCREMENT, session TEXT, tab TEXT, role TEXT, content TEXT, created_at REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS chat_messages_conv ON chat_messages (session, tab, seq)")
+            conn.execute("CREATE TABLE IF NOT EXISTS chat_summaries (session TEXT, tab TEXT, summary TEXT, upto INTEGER, PRIMARY KEY (session, tab))")
+            conn.execute("DELETE FROM chat_messages WHERE created_at < ?", (time.time() - self.max_age_days * 86400,))
+        self._conn, self._conn_pid = conn, os.getpid()
+        return conn
+
+    def append(self, session, tab, role, content):
+        with self._lock:
+            try:
+                with self._connection() as conn:
+                    conn.execute("INSERT INTO chat_messages (session, tab, role, content, created_at) VALUES (?, ?, ?, ?, ?)", (session, tab, role, content, time.time()))
+            except sqlite3.Error as e:
+                logging.error(f"Error guardando mensaje de chat: {e}")
+
+    def window(self, session, tab, budget_tokens):
+        """Resumen acumulado, turnos recientes que caben en `budget_tokens` y turnos ya fuera de la ventana sin resumir.
+
+        Los mensajes se devuelven como dicts {'role', 'content', 'seq'} en orden cronológico.
+        """
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute("SELECT summary, upto FROM chat_summaries WHERE session = ? AND tab = ?", (session, tab)).fetchone()
+                summary, upto = row if row else ('', 0)
+                rows = conn.execute("SELECT seq, role, content FROM chat_messages WHERE session = ? AND tab = ? AND seq > ? ORDER BY seq DESC", (session, tab, upto)).fetchall()
+            except sqlite3.Error as e:
+                logging.error(f"Error leyendo historial de chat: {e}")
+                return '', [], []
+        recent, used = [], estimate_text_tokens(summary)
+        for i, (seq, role, content) in enumerate(rows):
+            used += estimate_text_tokens(content)
+            if used > budget_tokens and recent:
+                overflow = [{'role': r, 'content': c, 'seq': s} for s, r, c in reversed(rows[i:])]
+                return summary, recent[::-1], overflow
+            recent.append({'role': role, 'content': content, 'seq': seq})
+        return summary, recent[::-1], []
+
+    def history(self, session, tab):
+        """Todos los mensajes guardados de la conversación como (rol, texto), en orden cronológico."""
+        with self._lock:
+            try:
+                return self._connection().execute("SELECT role, content FROM chat_messages WHERE session = ? AND tab = ? ORDER BY seq", (session, tab)).fetchall()
+            except sqlite3.Error as e:
+                logging.error(f"Error leyendo historial de chat: {e}")
+                return []
+
+    def set_summary(self, session, tab, summary, upto):
+        with self._lock:
+            try:
+                with self._connection() as conn:
+                    conn.execute("INSERT OR REPLACE INTO chat_summaries VALUES (?, ?, ?, ?)", (session, tab, summary, upto))
+                self.summaries_generated += 1
+            except sqlite3.Error as e:
+                logging.error(f"Error guardando resumen de chat: {e}")
+
+    def stats(self):
+        with self._lock:
+            try:
+                conn = self._connection()
+                conversations, messages = conn.execute("SELECT COUNT(DISTINCT session || '/' || tab), COUNT(*) FROM chat_messages").fetchone()
+            except sqlite3.Error as e:
+                return {'error': str(e)}
+            return {'path': self.path, 'conversations': conversations, 'messages': messages, 'summaries_generated': self.summaries_generated}
@@ -9,4 +9,78 @@ FACEBOOK_ID = os.getenv("FACEBOOK_ID")
 INSTAGRAM_ID = os.getenv("INSTAGRAM_ID")
 GA_PROPERTY_ID = os.getenv("GA_PROPERTY_ID")
 GA_KEY_PATH = os.getenv("GA_KEY_PATH")
-LOGO_PATH = os.getenv("LOGO_PATH")
\ No newline at end of file
+GA_PAGE_SIZE = int(os.getenv("GA_PAGE_SIZE", "100000"))  # Filas por página de RunReport (máx. 250000)
+LOGO_PATH = os.getenv("LOGO_PATH")
+
+# Cliente de la API Graph de Facebook/Instagram (conexiones keep-alive, timeouts en segundos, reintentos)
+GRAPH_API_VERSION = os.getenv("GRAPH_API_VERSION", "v22.0")
+GRAPH_POOL_SIZE = int(os.getenv("GRAPH_POOL_SIZE", "10"))
+GRAPH_CONNECT_TIMEOUT = float(os.getenv("GRAPH_CONNECT_TIMEOUT", "5"))
+GRAPH_READ_TIMEOUT = float(os.getenv("GRAPH_READ_TIMEOUT", "30"))
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "3"))
+# Uso de la cuota de la API Graph (% de X-App-Usage / X-Business-Use-Case-Usage): espaciar y aplazar el segundo plano, rechazar todo
+GRAPH_USAGE_SOFT_LIMIT = float(os.getenv("GRAPH_USAGE_SOFT_LIMIT", "50"))
+GRAPH_USAGE_BACKGROUND_LIMIT = float(os.getenv("GRAPH_USAGE_BACKGROUND_LIMIT", "75"))
+GRAPH_USAGE_HARD_LIMIT = float(os.getenv("GRAPH_USAGE_HARD_LIMIT", "95"))
+GRAPH_USAGE_WINDOW = float(os.getenv("GRAPH_USAGE_WINDOW", "3600"))  # Segundos en que Meta recupera la cuota (ventana móvil de 1 h)
+GRAPH_THROTTLE_MAX_DELAY = float(os.getenv("GRAPH_THROTTLE_MAX_DELAY", "10"))  # Espera máxima entre llamadas en segundo plano
+SOCIAL_PAGE_SIZE = int(os.getenv("SOCIAL_PAGE_SIZE", "100"))  # Publicaciones por página de /posts y /media
+SOCIAL_MAX_PAGES = int(os.getenv("SOCIAL_MAX_PAGES", "50"))
+SOCIAL_SNAPSHOT_TTL = int(os.getenv("SOCIAL_SNAPSHOT_TTL", "900"))  # Segundos antes de pedir publicaciones nuevas
+SOCIAL_FETCH_DEADLINE = float(os.getenv("SOCIAL_FETCH_DEADLINE", "30"))  # Segundos que un render espera a Facebook + Instagram
+SOCIAL_FETCH_WORKERS = int(os.getenv("SOCIAL_FETCH_WORKERS", "8"))  # Hilos por proceso para consultar las plataformas (2 por render simultáneo)
+# Insights por publicación: cada cuánto se refrescan según la antigüedad del post (segundos) y ids por consulta
+POST_INSIGHTS_TTL_RECENT = int(os.getenv("POST_INSIGHTS_TTL_RECENT", "3600"))  # Posts de menos de 48 h
+POST_INSIGHTS_TTL_MONTH = int(os.getenv("POST_INSIGHTS_TTL_MONTH", "86400"))  # Posts de hasta 30 días
+POST_INSIGHTS_TTL_OLD = int(os.getenv("POST_INSIGHTS_TTL_OLD", "604800"))  # Posts más antiguos
+POST_INSIGHTS_TIERS = [(48 * 3600, POST_INSIGHTS_TTL_RECENT), (30 * 86400, POST_INSIGHTS_TTL_MONTH), (None, POST_INSIGHTS_TTL_OLD)]
+POST_INSIGHTS_BATCH_SIZE = int(os.getenv("POST_INSIGHTS_BATCH_SIZE", "50"))  # Máximo de ids por consulta ?ids= de la API Graph
+
+# Caché de resultados de GA4 (segundos / megabytes)
+GA_CACHE_TTL = int(os.getenv("GA_CACHE_TTL", "900"))
+GA_CACHE_HISTORICAL_TTL = int(os.getenv("GA_CACHE_HISTORICAL_TTL", "86400"))
+GA_CACHE_MAX_MB = float(os.getenv("GA_CACHE_MAX_MB", "256"))
+GA_DATA_FINAL_DAYS = int(os.getenv("GA_DATA_FINAL_DAYS", "3"))
+GA_STORE_DIR = os.getenv("GA_STORE_DIR", ".ga_store")  # Particiones diarias de GA4 ('' = solo memoria)
+
+# Ejecución concurrente de reportes GA4 por render
+GA_MAX_WORKERS = int(os.getenv("GA_MAX_WORKERS", "8"))
+GA_MAX_CONCURRENCY_PER_PROPERTY = int(os.getenv("GA_MAX_CONCURRENCY_PER_PROPERTY", "4"))
+GA_RENDER_DEADLINE = float(os.getenv("GA_RENDER_DEADLINE", "20"))
+
+# Límites del DatePicker guardados por el warm-up de GA4 (se usan al arrancar sin esperar a GA)
+DATE_BOUNDS_CACHE_PATH = os.getenv("DATE_BOUNDS_CACHE_PATH", os.path.join(GA_STORE_DIR or ".", "date_bounds.json"))
+
+# Caché de respuestas de OpenAI por contenido (segundos / megabytes / SQLite; '' = solo memoria)
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", "86400"))
+AI_CACHE_MAX_MB = float(os.getenv("AI_CACHE_MAX_MB", "32"))
+AI_CACHE_PATH = os.getenv("AI_CACHE_PATH", os.path.join(GA_STORE_DIR, "ai_cache.sqlite") if GA_STORE_DIR else "")
+
+# Insights de IA generados en segundo plano (hilos / intervalo de consulta del navegador en ms / consultas máximas)
+AI_MAX_WORKERS = int(os.getenv("AI_MAX_WORKERS", "4"))
+AI_INSIGHT_POLL_MS = int(os.getenv("AI_INSIGHT_POLL_MS", "1000"))
+AI_INSIGHT_MAX_POLLS = int(os.getenv("AI_INSIGHT_MAX_POLLS", "120"))
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "30"))  # Segundos por llamada a OpenAI
+AI_CHAT_STREAM_POLL_MS = int(os.getenv("AI_CHAT_STREAM_POLL_MS", "300"))  # Cada cuánto el chat pinta la respuesta en curso
+AI_RENDER_BUDGET = float(os.getenv("AI_RENDER_BUDGET", "15"))  # Segundos que un render espera sus insights en paralelo
+AI_RENDER_HEDGE_AFTER = float(os.getenv("AI_RENDER_HEDGE_AFTER", "5"))  # Segundos tras los que, si la llamada conjunta no respondió, se piden además los insights por separado
+# Segundos tras los que un worker que no conoce el trabajo lo relanza (antes solo mira la caché de IA)
+AI_INSIGHT_RESUBMIT_AFTER = float(os.getenv("AI_INSIGHT_RESUBMIT_AFTER", str(2 * AI_REQUEST_TIMEOUT)))
+
+# Historial del chat IA en el servidor (SQLite compartido entre workers; '' = memoria del proceso)
+CHAT_STORE_PATH = os.getenv("CHAT_STORE_PATH", os.path.join(GA_STORE_DIR, "chat.sqlite") if GA_STORE_DIR else "")
+CHAT_HISTORY_DAYS = int(os.getenv("CHAT_HISTORY_DAYS", "7"))
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "1500"))  # Tokens de historial (resumen + turnos recientes) enviados al modelo
+
+# Cliente OpenAI compartido: límites de la cuenta (por minuto), llamadas simultáneas y reintentos ante 429/5xx
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "500"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "4"))
+
+# Pre-calentado en segundo plano de las vistas por defecto (últimos 30 días)
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "1").lower() not in ("0", "false", "no")
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "3600"))  # Segundos entre ciclos
+PREWARM_JITTER = float(os.getenv("PREWARM_JITTER", "300"))  # +/- segundos aleatorios por ciclo
+PREWARM_IDLE_SECONDS = float(os.getenv("PREWARM_IDLE_SECONDS", "5"))  # Silencio requerido antes de cada vista
+PREWARM_LOCK_PATH = os.getenv("PREWARM_LOCK_PATH", os.path.join(GA_STORE_DIR or ".", "prewarm.lock"))
\ No newline at end of file
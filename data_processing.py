@@ -1,14 +1,17 @@
 import pandas as pd
+import numpy as np
 import base64
 import io
 import logging
-import requests
 import re
 from datetime import datetime, timedelta
 
 # Dependencias de tu proyecto
-from config import FB_ACCESS_TOKEN
-from utils import query_ga
+from config import SOCIAL_PAGE_SIZE, SOCIAL_MAX_PAGES
+from graph_api import graph_client
+from post_insights import IG_INSIGHT_COLUMNS, insight_values, facebook_counters, apply_post_insights
+from utils import query_ga_batch
+from ga_filters import in_list
 
 # --- Funciones de 'ops_sales.py' ---
 
@@ -74,83 +77,127 @@ def unify_data(contents, filenames):
 
 # --- Funciones de 'web_social.py' ---
 
-def get_facebook_data(endpoint, params={}):
-    """Realiza una solicitud a la API Graph de Facebook."""
-    base_url = "https://graph.facebook.com/v22.0/"
-    url = f"{base_url}{endpoint}"
-    params['access_token'] = FB_ACCESS_TOKEN
+# Los feeds se piden sin `insights` ni contadores: esos valores los sirve solo la caché escalonada de post_insights
+FB_POST_FIELDS = 'id,message,created_time'
+IG_MEDIA_FIELDS = 'id,caption,media_type,media_url,permalink,thumbnail_url,timestamp,username'
+
+def _to_unix(value):
+    return int(pd.Timestamp(value).timestamp()) if value is not None else None
+
+def iter_graph_pages(endpoint, fields, time_field, since=None, until=None, page_size=SOCIAL_PAGE_SIZE, max_pages=SOCIAL_MAX_PAGES):
+    """Genera las páginas de un edge de la API Graph siguiendo `paging.next`.
+
+    `since`/`until` se envían a la API para acotar el rango; como los edges vienen del más
+    reciente al más antiguo, además se deja de paginar en cuanto una página llega a `since`.
+    Los errores se propagan (RequestException) para que quien llama distinga un fallo de un
+    rango sin publicaciones.
+    """
+    params = {'fields': fields, 'limit': page_size}
+    if since is not None: params['since'] = _to_unix(since)
+    if until is not None: params['until'] = _to_unix(until)
+    since_ts = pd.Timestamp(since) if since is not None else None
+    data = graph_client.get(endpoint, params).json()
+    for _ in range(max_pages):
+        page = data.get('data', [])
+        if not page:
+            return
+        yield page
+        if since_ts is not None:
+            oldest = pd.to_datetime([item.get(time_field) for item in page], errors='coerce', utc=True).min()
+            if pd.notna(oldest) and oldest.tz_localize(None) < since_ts:
+                return
+        next_url = data.get('paging', {}).get('next')
+        if not next_url:
+            return
+        data = graph_client.get(next_url).json()
+    logging.warning(f"Se alcanzó el máximo de {max_pages} páginas para {endpoint}")
+
+def load_facebook_posts(facebook_id, start_date, end_date):
+    """DataFrame de publicaciones de Facebook entre `start_date` y `end_date`, procesando cada página al llegar.
+
+    Las impresiones salen de la caché de insights por publicación (solo se piden las obsoletas).
+    """
+    until = pd.Timestamp(end_date) + timedelta(days=1)
+    frames = [process_facebook_posts(page) for page in iter_graph_pages(f"{facebook_id}/posts", FB_POST_FIELDS, 'created_time', start_date, until)]
+    return apply_post_insights('facebook', pd.concat(frames, ignore_index=True)) if frames else process_facebook_posts([])
+
+def load_instagram_posts(instagram_id, start_date, end_date):
+    """DataFrame de medios de Instagram entre `start_date` y `end_date`, procesando cada página al llegar.
+
+    Impresiones, alcance, interacciones y reproducciones salen de la caché de insights por publicación.
+    """
+    until = pd.Timestamp(end_date) + timedelta(days=1)
+    frames = [process_instagram_posts(page) for page in iter_graph_pages(f"{instagram_id}/media", IG_MEDIA_FIELDS, 'timestamp', start_date, until)]
+    return apply_post_insights('instagram', pd.concat(frames, ignore_index=True)) if frames else process_instagram_posts([])
+
+FB_POST_COLUMNS = ['id', 'message', 'created_time', 'likes_count', 'comments_count', 'shares_count', 'impressions']
+IG_MEDIA_COLUMNS = ['id', 'caption', 'media_type', 'media_url', 'permalink', 'thumbnail_url', 'timestamp', 'username', 'like_count', 'comments_count', 'impressions', 'reach', 'engagement', 'video_views']
+
+def _finish_posts_df(df, count_columns, time_column):
+    """Tipa en bloque los contadores (int64, ausentes = 0) y convierte la fecha una sola vez."""
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error en la solicitud a la API Graph de Facebook: {e}")
-        return {}
-
-def get_facebook_posts(facebook_id):
-    """Obtiene las publicaciones de una página de Facebook."""
-    endpoint = f"{facebook_id}/posts"
-    params = {'fields': 'id,message,created_time,likes.summary(true),comments.summary(true),shares,insights.metric(post_impressions)'}
-    data = get_facebook_data(endpoint, params)
-    return data.get('data', [])
-
-def get_instagram_posts(instagram_id):
-    """Obtiene los medios de una cuenta de Instagram."""
-    endpoint = f"{instagram_id}/media"
-    params = {'fields': 'id,caption,media_type,media_url,permalink,thumbnail_url,timestamp,username,like_count,comments_count,insights.metric(impressions,reach,total_interactions,video_views)'}
-    data = get_facebook_data(endpoint, params)
-    return data.get('data', [])
+        counts = df[count_columns].astype('float64')
+    except (ValueError, TypeError):
+        counts = df[count_columns].apply(pd.to_numeric, errors='coerce')
+    df[count_columns] = counts.fillna(0).astype('int64')
+    df[time_column] = pd.to_datetime(df[time_column], utc=True, errors='coerce').dt.tz_localize(None)
+    return df
 
 def process_facebook_posts(posts):
-    """Procesa la respuesta de la API de publicaciones de Facebook a un DataFrame."""
-    if not posts: return pd.DataFrame(columns=['id', 'message', 'created_time', 'likes_count', 'comments_count', 'shares_count', 'impressions'])
-    df = pd.DataFrame(posts)
-    if 'likes' in df.columns: df['likes_count'] = df['likes'].apply(lambda x: x['summary']['total_count'] if isinstance(x, dict) and 'summary' in x else 0)
-    else: df['likes_count'] = 0
-    if 'comments' in df.columns: df['comments_count'] = df['comments'].apply(lambda x: x['summary']['total_count'] if isinstance(x, dict) and 'summary' in x else 0)
-    else: df['comments_count'] = 0
-    if 'shares' in df.columns: df['shares_count'] = df['shares'].apply(lambda x: x.get('count', 0) if isinstance(x, dict) else 0)
-    else: df['shares_count'] = 0
-    if 'insights' in df.columns: df['impressions'] = df['insights'].apply(lambda x: next((item['values'][0]['value'] for item in x.get('data', []) if item.get('name') == 'post_impressions'), 0) if isinstance(x, dict) else 0)
-    else: df['impressions'] = 0
-    if 'created_time' in df.columns: df['created_time'] = pd.to_datetime(df['created_time']).dt.tz_localize(None)
-    else: df['created_time'] = pd.NaT
-    return df[['id', 'message', 'created_time', 'likes_count', 'comments_count', 'shares_count', 'impressions']]
+    """Procesa la respuesta de la API de publicaciones de Facebook a un DataFrame (una sola pasada por las publicaciones)."""
+    if not posts: return pd.DataFrame(columns=FB_POST_COLUMNS)
+    records = [
+        (
+            post.get('id'), post.get('message'), post.get('created_time'),
+            *facebook_counters(post).values(),
+            insight_values(post).get('post_impressions'),
+        )
+        for post in posts
+    ]
+    df = pd.DataFrame.from_records(records, columns=FB_POST_COLUMNS)
+    return _finish_posts_df(df, ['likes_count', 'comments_count', 'shares_count', 'impressions'], 'created_time')
 
 def process_instagram_posts(posts):
-    """Procesa la respuesta de la API de medios de Instagram a un DataFrame."""
-    if not posts: return pd.DataFrame(columns=['id', 'caption', 'media_type', 'media_url', 'permalink', 'thumbnail_url', 'timestamp', 'username', 'like_count', 'comments_count', 'impressions', 'reach', 'engagement', 'video_views'])
-    df = pd.DataFrame(posts)
-    if 'insights' in df.columns:
-        df['impressions'] = df['insights'].apply(lambda x: next((item['values'][0]['value'] for item in x.get('data', []) if item.get('name') == 'impressions'), 0) if isinstance(x, dict) else 0)
-        df['reach'] = df['insights'].apply(lambda x: next((item['values'][0]['value'] for item in x.get('data', []) if item.get('name') == 'reach'), 0) if isinstance(x, dict) else 0)
-        df['engagement'] = df['insights'].apply(lambda x: next((item['values'][0]['value'] for item in x.get('data', []) if item.get('name') == 'total_interactions'), 0) if isinstance(x, dict) else 0)
-        df['video_views'] = df['insights'].apply(lambda x: next((item['values'][0]['value'] for item in x.get('data', []) if item.get('name') == 'video_views'), 0) if isinstance(x, dict) else 0)
-    else:
-        df['impressions'] = df['reach'] = df['engagement'] = df['video_views'] = 0
-    if 'timestamp' in df.columns: df['timestamp'] = pd.to_datetime(df['timestamp']).dt.tz_localize(None)
-    else: df['timestamp'] = pd.NaT
-    for col in ['like_count', 'comments_count']:
-        if col not in df.columns: df[col] = 0
-    return df[['id', 'caption', 'media_type', 'media_url', 'permalink', 'thumbnail_url', 'timestamp', 'username', 'like_count', 'comments_count', 'impressions', 'reach', 'engagement', 'video_views']]
-
-def get_funnel_data(steps_config, start_date, end_date):
-    """Obtiene los datos para los gráficos de embudo desde Google Analytics."""
-    counts = []
-    labels = []
-    for step in steps_config:
-        labels.append(step['label'])
-        if step['value'] == 'page_view':
-            df_step_sessions = query_ga(metrics=['sessions'], dimensions=['eventName'], start_date=start_date, end_date=end_date)
-            count = int(df_step_sessions['sessions'].sum()) if not df_step_sessions.empty else 0
-        else:
-            metric_to_use = 'eventCount'
-            dim_to_use = 'eventName'
-            df_step = query_ga(metrics=[metric_to_use], dimensions=[dim_to_use], start_date=start_date, end_date=end_date)
-            if not df_step.empty:
-                df_step_filtered = df_step[df_step[dim_to_use] == step['value']]
-                count = int(df_step_filtered[metric_to_use].sum()) if not df_step_filtered.empty else 0
-            else:
-                count = 0
-        counts.append(count)
-    return labels, counts
\ No newline at end of file
+    """Procesa la respuesta de la API de medios de Instagram a un DataFrame (los insights se recorren una sola vez)."""
+    if not posts: return pd.DataFrame(columns=IG_MEDIA_COLUMNS)
+    df = pd.DataFrame(posts, columns=IG_MEDIA_COLUMNS[:10])
+    insights = pd.DataFrame([insight_values(post) for post in posts], columns=list(IG_INSIGHT_COLUMNS))
+    df[list(IG_INSIGHT_COLUMNS.values())] = insights.to_numpy()
+    return _finish_posts_df(df, ['like_count', 'comments_count', 'impressions', 'reach', 'engagement', 'video_views'], 'timestamp')
+
+def compute_funnels(funnels, df_sessions, df_events):
+    """Calcula todos los pasos de varios funnels a partir de un reporte de sesiones y uno de eventos.
+
+    `funnels` es un dict nombre -> lista de pasos (como `funnel_whatsapp`). El paso `page_view`
+    cuenta las sesiones del reporte `sessions by eventName`; el resto, el `eventCount` de su evento.
+    Devuelve un DataFrame largo (funnel, step, label, value, count, conversion_rate, overall_rate,
+    drop_off, drop_off_rate) con las tasas de cada paso respecto al anterior y al inicial.
+    """
+    steps = pd.DataFrame([
+        {'funnel': name, 'step': i, 'label': step['label'], 'value': step['value']}
+        for name, steps_config in funnels.items() for i, step in enumerate(steps_config)
+    ], columns=['funnel', 'step', 'label', 'value'])
+    total_sessions = df_sessions['sessions'].sum() if not df_sessions.empty else 0
+    event_totals = df_events.groupby('eventName')['eventCount'].sum() if not df_events.empty else pd.Series(dtype=float)
+
+    steps['count'] = steps['value'].map(event_totals).fillna(0)
+    steps.loc[steps['value'] == 'page_view', 'count'] = total_sessions
+    steps['count'] = steps['count'].astype(int)
+
+    grouped = steps.groupby('funnel', sort=False)['count']
+    previous = grouped.shift(1).fillna(steps['count'])
+    first = grouped.transform('first')
+    steps['conversion_rate'] = (steps['count'] / previous.replace(0, np.nan) * 100).fillna(0)
+    steps['overall_rate'] = (steps['count'] / first.replace(0, np.nan) * 100).fillna(0)
+    steps['drop_off'] = (previous - steps['count']).clip(lower=0).astype(int)
+    steps['drop_off_rate'] = (steps['drop_off'] / previous.replace(0, np.nan) * 100).fillna(0)
+    return steps
+
+def get_funnels_data(funnels, start_date, end_date):
+    """Obtiene los datos de varios funnels con un solo batch de GA4 (un reporte de sesiones y uno de eventos)."""
+    event_names = sorted({step['value'] for steps_config in funnels.values() for step in steps_config if step['value'] != 'page_view'})
+    df_sessions, df_events = query_ga_batch([
+        {'metrics': ['sessions'], 'dimensions': ['eventName']},
+        {'metrics': ['eventCount'], 'dimensions': ['eventName'], 'dimension_filter': in_list('eventName', event_names)},
+    ], start_date=start_date, end_date=end_date)
+    return compute_funnels(funnels, df_sessions, df_events)
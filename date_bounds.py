@@ -0,0 +1,81 @@
+import os
+import json
+import logging
+import threading
+from datetime import date, datetime, timedelta
+
+from config import DATE_BOUNDS_CACHE_PATH
+from ga_store import query_ga_daily
+
+START_DATE_GLOBAL = '2023-01-01'
+END_DATE_GLOBAL = 'today'
+
+_lock = threading.Lock()
+_bounds = None
+_warmup_pid = None
+
+
+def default_bounds():
+    """Límites por defecto del DatePicker (último año) mientras no se conocen los de GA4."""
+    max_date_allowed = datetime.now().date()
+    return max_date_allowed - timedelta(days=365), max_date_allowed
+
+
+def load_cached_bounds():
+    """Límites guardados por el último warm-up (o None si no hay archivo válido)."""
+    try:
+        with open(DATE_BOUNDS_CACHE_PATH) as f:
+            cached = json.load(f)
+        return date.fromisoformat(cached['min']), date.fromisoformat(cached['max'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _save_bounds(bounds):
+    try:
+        os.makedirs(os.path.dirname(DATE_BOUNDS_CACHE_PATH) or '.', exist_ok=True)
+        tmp_path = f"{DATE_BOUNDS_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'min': bounds[0].isoformat(), 'max': bounds[1].isoformat()}, f)
+        os.replace(tmp_path, DATE_BOUNDS_CACHE_PATH)
+    except OSError as e:
+        logging.warning(f"No se pudieron guardar los límites del DatePicker: {e}")
+
+
+def _fetch_bounds():
+    global _bounds
+    try:
+        df = query_ga_daily(metrics=['sessions'], dimensions=['date'], start_date=START_DATE_GLOBAL, end_date=END_DATE_GLOBAL)
+        if df.empty:
+            raise ValueError("No initial data for DatePicker")
+        bounds = (df['date'].min().date(), df['date'].max().date())
+        with _lock:
+            _bounds = bounds
+        _save_bounds(bounds)
+        logging.info(f"DatePicker bounds desde GA4: min={bounds[0]}, max={bounds[1]}")
+    except Exception as e:
+        logging.warning(f"Could not load initial dates for DatePicker from GA4: {e}. Se mantienen los límites actuales.")
+
+
+def start_bounds_warmup():
+    """Lanza (una vez por proceso) la consulta de límites a GA4 en un hilo de fondo."""
+    global _warmup_pid
+    with _lock:
+        if _warmup_pid == os.getpid():
+            return
+        _warmup_pid = os.getpid()
+    threading.Thread(target=_fetch_bounds, name='date-bounds-warmup', daemon=True).start()
+
+
+def get_bounds():
+    """Límites de GA4 ya conocidos en este proceso; si aún no están, arranca el warm-up y devuelve None."""
+    with _lock:
+        if _bounds is not None:
+            return _bounds
+    start_bounds_warmup()
+    return None
+
+
+def initial_bounds():
+    """Límites para construir el layout sin esperar a GA4: los guardados en disco o los por defecto."""
+    return load_cached_bounds() or default_bounds()
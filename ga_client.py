@@ -0,0 +1,72 @@
+import os
+import threading
+import logging
+from google.analytics.data_v1beta import BetaAnalyticsDataClient
+from google.oauth2 import service_account
+
+from process_local import ProcessLocal
+
+GA_SCOPES = ['https://www.googleapis.com/auth/analytics.readonly']
+
+
+class GAClientPool:
+    """Un cliente GA4 (y su canal gRPC) por (propiedad, llave), con las credenciales leídas una sola vez por llave."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._credentials = {}
+        self._clients = {}
+        self._reuses = {}
+        self._credentials_loaded = 0
+
+    def _get_credentials(self, key_path):
+        creds = self._credentials.get(key_path)
+        if creds is None:
+            creds = service_account.Credentials.from_service_account_file(key_path, scopes=GA_SCOPES)
+            self._credentials[key_path] = creds
+            self._credentials_loaded += 1
+        return creds
+
+    def get_client(self, property_id, key_path):
+        """Devuelve el cliente cacheado para (property_id, key_path), creándolo si no existe."""
+        key = (str(property_id), key_path)
+        client = self._clients.get(key)
+        if client is not None:
+            with self._lock:
+                self._reuses[key] = self._reuses.get(key, 0) + 1
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = BetaAnalyticsDataClient(credentials=self._get_credentials(key_path))
+                self._clients[key] = client
+                self._reuses[key] = 0
+                logging.info(f"GA client pool: nuevo canal para la propiedad {property_id} (pid {self._pid}).")
+            else:
+                self._reuses[key] = self._reuses.get(key, 0) + 1
+            return client
+
+    def stats(self):
+        """Resumen de uso del pool: canales abiertos, reutilizaciones y estado de los tokens."""
+        with self._lock:
+            return {
+                'pid': self._pid,
+                'channels': len(self._clients),
+                'credentials_loaded': self._credentials_loaded,
+                'reuses': {f"{prop}|{key}": n for (prop, key), n in self._reuses.items()},
+                'tokens_valid': {key: bool(creds.valid) for key, creds in self._credentials.items()},
+            }
+
+
+# Los canales gRPC heredados del proceso padre no son seguros tras un fork (workers de gunicorn)
+_pool = ProcessLocal(GAClientPool)
+
+
+def get_ga_client(property_id, key_path):
+    """Cliente GA4 compartido por el proceso para (property_id, key_path)."""
+    return _pool.get().get_client(property_id, key_path)
+
+
+def ga_client_stats():
+    return _pool.get().stats()
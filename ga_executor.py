@@ -0,0 +1,52 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from config import GA_PROPERTY_ID, GA_MAX_WORKERS, GA_MAX_CONCURRENCY_PER_PROPERTY, GA_RENDER_DEADLINE
+from process_local import ProcessLocal
+
+_lock = threading.Lock()
+_executor = ProcessLocal(lambda: ThreadPoolExecutor(max_workers=GA_MAX_WORKERS, thread_name_prefix='ga-report'))
+_semaphores = ProcessLocal(dict)
+
+
+def _property_semaphore(property_id):
+    with _lock:
+        return _semaphores.get().setdefault(str(property_id), threading.BoundedSemaphore(GA_MAX_CONCURRENCY_PER_PROPERTY))
+
+
+def _run_limited(fn, property_id):
+    with _property_semaphore(property_id):
+        return fn()
+
+
+def run_ga_tasks(tasks, deadline=GA_RENDER_DEADLINE, property_id=GA_PROPERTY_ID):
+    """Ejecuta en paralelo las consultas independientes de un render.
+
+    `tasks` es un dict nombre -> (función sin argumentos, valor por defecto). Como mucho
+    GA_MAX_CONCURRENCY_PER_PROPERTY consultas corren a la vez contra la misma propiedad. Lo que
+    no termine antes de `deadline` segundos (o falle) se devuelve con su valor por defecto, así
+    el render sale con resultados parciales; las consultas tardías siguen en segundo plano y
+    dejan su resultado en la caché para el siguiente render.
+    """
+    if not tasks:
+        return {}
+    executor = _executor.get()
+    started = time.monotonic()
+    futures = {name: executor.submit(_run_limited, fn, property_id) for name, (fn, _) in tasks.items()}
+    done, _ = wait(futures.values(), timeout=deadline)
+
+    results = {}
+    for name, future in futures.items():
+        fallback = tasks[name][1]
+        if future not in done:
+            logging.warning(f"Consulta GA4 '{name}' no terminó en {deadline}s; se devuelve resultado parcial.")
+            results[name] = fallback
+        elif future.exception() is not None:
+            logging.error(f"Error en consulta GA4 '{name}': {future.exception()}")
+            results[name] = fallback
+        else:
+            results[name] = future.result()
+    logging.info(f"{len(tasks)} consultas GA4 en paralelo completadas en {time.monotonic() - started:.2f}s")
+    return results
@@ -0,0 +1,99 @@
+"""Expresiones de filtro y orden para query_ga, compiladas a FilterExpression/OrderBy de GA4.
+
+Las expresiones son tuplas inmutables (sirven como parte de la clave de caché):
+
+    in_list('eventName', ['Clic_Whatsapp', 'Lleno Formulario'])
+    not_(in_list('country', ['(not set)', '']))
+    and_(equals('deviceCategory', 'mobile'), greater_than('sessions', 10))
+    order_by('activeUsers')                 # descendente por defecto
+"""
+from google.analytics.data_v1beta.types import Filter, FilterExpression, FilterExpressionList, NumericValue, OrderBy
+
+_NUMERIC_OPS = {
+    'gt': Filter.NumericFilter.Operation.GREATER_THAN,
+    'gte': Filter.NumericFilter.Operation.GREATER_THAN_OR_EQUAL,
+    'lt': Filter.NumericFilter.Operation.LESS_THAN,
+    'lte': Filter.NumericFilter.Operation.LESS_THAN_OR_EQUAL,
+}
+
+
+def equals(field, value):
+    return ('eq', field, str(value))
+
+
+def in_list(field, values):
+    return ('in', field, tuple(str(v) for v in values))
+
+
+def contains(field, value):
+    return ('contains', field, str(value))
+
+
+def greater_than(field, value):
+    return ('gt', field, value)
+
+
+def greater_or_equal(field, value):
+    return ('gte', field, value)
+
+
+def less_than(field, value):
+    return ('lt', field, value)
+
+
+def less_or_equal(field, value):
+    return ('lte', field, value)
+
+
+def not_(expr):
+    return ('not', expr)
+
+
+def and_(*exprs):
+    return ('and',) + tuple(exprs)
+
+
+def or_(*exprs):
+    return ('or',) + tuple(exprs)
+
+
+def order_by(field, desc=True):
+    return ('order', field, bool(desc))
+
+
+def _numeric_value(value):
+    return NumericValue(int64_value=value) if isinstance(value, int) else NumericValue(double_value=float(value))
+
+
+def compile_filter(expr):
+    """Convierte una expresión en un FilterExpression de GA4 (None si no hay filtro)."""
+    if expr is None:
+        return None
+    op = expr[0]
+    if op == 'and':
+        return FilterExpression(and_group=FilterExpressionList(expressions=[compile_filter(e) for e in expr[1:]]))
+    if op == 'or':
+        return FilterExpression(or_group=FilterExpressionList(expressions=[compile_filter(e) for e in expr[1:]]))
+    if op == 'not':
+        return FilterExpression(not_expression=compile_filter(expr[1]))
+    _, field, value = expr
+    if op == 'eq':
+        return FilterExpression(filter=Filter(field_name=field, string_filter=Filter.StringFilter(value=value, match_type=Filter.StringFilter.MatchType.EXACT)))
+    if op == 'contains':
+        return FilterExpression(filter=Filter(field_name=field, string_filter=Filter.StringFilter(value=value, match_type=Filter.StringFilter.MatchType.CONTAINS)))
+    if op == 'in':
+        return FilterExpression(filter=Filter(field_name=field, in_list_filter=Filter.InListFilter(values=list(value))))
+    if op in _NUMERIC_OPS:
+        return FilterExpression(filter=Filter(field_name=field, numeric_filter=Filter.NumericFilter(operation=_NUMERIC_OPS[op], value=_numeric_value(value))))
+    raise ValueError(f"Operación de filtro GA4 no soportada: {op}")
+
+
+def compile_order_bys(order_bys, metrics):
+    """Convierte una lista de `order_by(...)` en OrderBy de GA4, por métrica o por dimensión según el campo."""
+    compiled = []
+    for _, field, desc in order_bys or ():
+        if field in metrics:
+            compiled.append(OrderBy(metric=OrderBy.MetricOrderBy(metric_name=field), desc=desc))
+        else:
+            compiled.append(OrderBy(dimension=OrderBy.DimensionOrderBy(dimension_name=field), desc=desc))
+    return compiled
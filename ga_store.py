@@ -0,0 +1,115 @@
+import os
+import hashlib
+import logging
+import threading
+from datetime import date, datetime, timedelta
+import pandas as pd
+
+from config import GA_PROPERTY_ID, GA_KEY_PATH, GA_CACHE_TTL, GA_DATA_FINAL_DAYS, GA_STORE_DIR
+from utils import GA_BATCH_SIZE, fetch_ga_batch, resolve_ga_date
+from cache import SharedPickle
+
+
+class GADailyStore:
+    """Reportes GA4 con dimensión `date` guardados por día (en disco si hay `base_dir`); solo se piden los días faltantes o no definitivos."""
+
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir
+        self._reports = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.days_served = 0
+        self.days_fetched = 0
+        self.requests = 0
+
+    def _report_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _report(self, key):
+        """Particiones del reporte (SharedPickle: se releen si otro worker las guardó después)."""
+        if key not in self._reports:
+            digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+            path = os.path.join(self.base_dir, f"ga_{digest}.pkl") if self.base_dir else None
+            self._reports[key] = SharedPickle(path, default=dict, label='el almacén GA')
+        return self._reports[key]
+
+    @staticmethod
+    def _is_stale(day, fetched_at, now):
+        """Un día es obsoleto si se descargó antes de ser definitivo y ya pasó el TTL o ya es definitivo."""
+        if day < fetched_at.date() - timedelta(days=GA_DATA_FINAL_DAYS):
+            return False
+        return (now - fetched_at).total_seconds() > GA_CACHE_TTL or day < now.date() - timedelta(days=GA_DATA_FINAL_DAYS)
+
+    @staticmethod
+    def _missing_ranges(days):
+        """Agrupa días sueltos en rangos contiguos (start, end)."""
+        ranges = []
+        for day in sorted(days):
+            if ranges and day == ranges[-1][1] + timedelta(days=1):
+                ranges[-1][1] = day
+            else:
+                ranges.append([day, day])
+        return ranges
+
+    def query(self, metrics, dimensions, start_date, end_date, property_id=GA_PROPERTY_ID, key_path=GA_KEY_PATH):
+        """Equivalente a `query_ga` para reportes con dimensión `date`, servido desde las particiones diarias."""
+        columns = dimensions + metrics
+        today = date.today()
+        start, end = resolve_ga_date(start_date, today), min(resolve_ga_date(end_date, today), today)
+        if start > end:
+            return pd.DataFrame(columns=columns)
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        key = (str(property_id), tuple(metrics), tuple(dimensions))
+
+        with self._report_lock(key):
+            report = self._report(key)
+            partitions = report.get()
+            now = datetime.now()
+            missing = [d for d in days if d not in partitions or self._is_stale(d, partitions[d][1], now)]
+            if missing:
+                ranges = self._missing_ranges(missing)
+                reports = [{'metrics': metrics, 'dimensions': dimensions, 'start_date': s.isoformat(), 'end_date': e.isoformat()} for s, e in ranges]
+                try:
+                    for i in range(0, len(reports), GA_BATCH_SIZE):
+                        chunk = reports[i:i + GA_BATCH_SIZE]
+                        self.requests += 1
+                        for (range_start, range_end), df in zip(ranges[i:i + GA_BATCH_SIZE], fetch_ga_batch(chunk, property_id, key_path)):
+                            by_day = {ts.date(): part.reset_index(drop=True) for ts, part in df.groupby('date')} if not df.empty else {}
+                            for offset in range((range_end - range_start).days + 1):
+                                day = range_start + timedelta(days=offset)
+                                partitions[day] = (by_day.get(day, pd.DataFrame(columns=columns)), now)
+                                self.days_fetched += 1
+                except Exception as e:
+                    logging.error(f"Error actualizando el almacén diario GA4 ({metrics}/{dimensions}): {e}")
+                report.set(partitions)
+            parts = [partitions[d][0] for d in days if d in partitions and not partitions[d][0].empty]
+            self.days_served += len(days) - len(missing)
+
+        if not parts:
+            logging.warning(f"No se devolvieron datos para: {metrics}, {dimensions}")
+            return pd.DataFrame(columns=columns)
+        return pd.concat(parts, ignore_index=True).sort_values('date', ignore_index=True)
+
+    def stats(self):
+        return {
+            'reports': len(self._reports),
+            'days_stored': sum(len(r.peek() or ()) for r in self._reports.values()),
+            'days_served_from_store': self.days_served,
+            'days_fetched': self.days_fetched,
+            'ga_requests': self.requests,
+        }
+
+
+_store = GADailyStore(base_dir=GA_STORE_DIR or None)
+
+
+def query_ga_daily(metrics, dimensions, start_date='30daysAgo', end_date='today', property_id=GA_PROPERTY_ID, key_path=GA_KEY_PATH):
+    """Consulta un reporte con dimensión `date` descargando de GA4 solo los días faltantes o no definitivos."""
+    if 'date' not in dimensions:
+        raise ValueError("query_ga_daily requiere la dimensión 'date'")
+    return _store.query(metrics, dimensions, start_date, end_date, property_id, key_path)
+
+
+def ga_store_stats():
+    return _store.stats()
@@ -0,0 +1,189 @@
+import re
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    FB_ACCESS_TOKEN, GRAPH_API_VERSION, GRAPH_POOL_SIZE, GRAPH_CONNECT_TIMEOUT, GRAPH_READ_TIMEOUT, GRAPH_MAX_RETRIES,
+    GRAPH_USAGE_SOFT_LIMIT, GRAPH_USAGE_BACKGROUND_LIMIT, GRAPH_USAGE_HARD_LIMIT, GRAPH_USAGE_WINDOW, GRAPH_THROTTLE_MAX_DELAY,
+)
+from process_local import ProcessLocal
+
+GRAPH_BASE_URL = f"https://graph.facebook.com/{GRAPH_API_VERSION}/"
+_ID_SEGMENT = re.compile(r'^\d+(_\d+)?$')
+_USAGE_FIELDS = ('call_count', 'total_cputime', 'total_time')
+
+# Prioridad de las llamadas del contexto actual: 'interactive' (render de un usuario) o 'background' (pre-calentado)
+_priority = contextvars.ContextVar('graph_priority', default='interactive')
+
+
+class GraphThrottled(requests.exceptions.RequestException):
+    """La llamada no se hizo porque el uso de la API Graph está cerca del límite; quien llama sirve lo que tenga en caché."""
+
+
+@contextmanager
+def graph_priority(priority):
+    """Marca las llamadas a la API Graph hechas dentro del bloque (`with graph_priority('background'): ...`)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def _usage_percent(headers):
+    """(mayor % de uso, segundos hasta recuperar acceso) de las cabeceras X-App-Usage y X-Business-Use-Case-Usage."""
+    percents, regain = [], 0
+    try:
+        if headers.get('X-App-Usage'):
+            app_usage = json.loads(headers['X-App-Usage'])
+            percents += [float(app_usage.get(field) or 0) for field in _USAGE_FIELDS]
+        if headers.get('X-Business-Use-Case-Usage'):
+            for entries in json.loads(headers['X-Business-Use-Case-Usage']).values():
+                for entry in entries:
+                    percents += [float(entry.get(field) or 0) for field in _USAGE_FIELDS]
+                    regain = max(regain, float(entry.get('estimated_time_to_regain_access') or 0) * 60)
+    except (ValueError, TypeError, AttributeError) as e:
+        logging.warning(f"Cabeceras de uso de la API Graph no válidas: {e}")
+    return (max(percents) if percents else None), regain
+
+
+def _endpoint_name(endpoint):
+    """Nombre del endpoint para las métricas, sin los ids (`123/posts` -> `{id}/posts`, raíz `?ids=` -> `/`)."""
+    if not endpoint.strip('/'):
+        return '/'
+    return '/'.join('{id}' if _ID_SEGMENT.match(part) else part for part in endpoint.strip('/').split('/'))
+
+
+class GraphAPIClient:
+    """Cliente de la API Graph sobre una `requests.Session` keep-alive con reintentos, métricas por endpoint y control de la cuota de uso."""
+
+    def __init__(self, access_token, pool_size, timeout, max_retries):
+        self.access_token = access_token
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._session = ProcessLocal(self._new_session)
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._usage = 0.0
+        self._usage_at = 0.0
+        self._regain_at = 0.0
+        self._throttle = {'delayed': 0, 'delay_s': 0.0, 'deferred': 0, 'rejected': 0}
+
+    def _new_session(self):
+        retry = Retry(
+            total=self.max_retries, connect=self.max_retries, read=self.max_retries, backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True, raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        return session
+
+    def _get_session(self):
+        """Sesión del proceso; se recrea tras un fork porque las conexiones abiertas no se comparten."""
+        return self._session.get()
+
+    def _record(self, endpoint, elapsed, error):
+        name = _endpoint_name(endpoint)
+        with self._lock:
+            stats = self._endpoints.setdefault(name, {'requests': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            stats['requests'] += 1
+            stats['errors'] += int(error)
+            stats['total_ms'] += elapsed * 1000
+            stats['max_ms'] = max(stats['max_ms'], elapsed * 1000)
+
+    def usage(self):
+        """Uso estimado de la cuota (%): el último reportado por Meta, decayendo linealmente en la ventana."""
+        with self._lock:
+            elapsed = time.time() - self._usage_at
+            return self._usage * max(0.0, 1 - elapsed / GRAPH_USAGE_WINDOW)
+
+    def _update_usage(self, headers):
+        percent, regain = _usage_percent(headers)
+        if percent is None:
+            return
+        with self._lock:
+            self._usage, self._usage_at = percent, time.time()
+            if regain:
+                self._regain_at = max(self._regain_at, time.time() + regain)
+
+    def _throttle_check(self, path):
+        """Espacia, aplaza o rechaza la llamada según el uso estimado y la prioridad del contexto."""
+        usage, priority = self.usage(), _priority.get()
+        if usage >= GRAPH_USAGE_HARD_LIMIT or time.time() < self._regain_at:
+            kind = 'rejected'
+        elif priority == 'background' and usage >= GRAPH_USAGE_BACKGROUND_LIMIT:
+            kind = 'deferred'
+        else:
+            if priority == 'background' and usage > GRAPH_USAGE_SOFT_LIMIT:
+                delay = GRAPH_THROTTLE_MAX_DELAY * (usage - GRAPH_USAGE_SOFT_LIMIT) / max(GRAPH_USAGE_BACKGROUND_LIMIT - GRAPH_USAGE_SOFT_LIMIT, 1)
+                with self._lock:
+                    self._throttle['delayed'] += 1
+                    self._throttle['delay_s'] += delay
+                time.sleep(delay)
+            return
+        with self._lock:
+            self._throttle[kind] += 1
+        raise GraphThrottled(f"Uso de la API Graph al {usage:.0f}%: llamada {priority} a {_endpoint_name(path)} no realizada")
+
+    def get(self, endpoint, params=None):
+        """GET a `endpoint` (relativo a la versión de la API o URL absoluta de paginación); lanza RequestException.
+
+        Si el uso de la cuota no permite la llamada con la prioridad actual lanza GraphThrottled.
+        """
+        if endpoint.startswith('https://'):
+            url, path = endpoint, endpoint.split('?')[0].split(f"/{GRAPH_API_VERSION}/")[-1]
+        else:
+            url, path = f"{GRAPH_BASE_URL}{endpoint}", endpoint
+        self._throttle_check(path)
+        params = dict(params or {})
+        if 'access_token=' not in url:
+            params['access_token'] = self.access_token
+        started = time.monotonic()
+        error = True
+        try:
+            response = self._get_session().get(url, params=params, timeout=self.timeout)
+            self._update_usage(response.headers)
+            response.raise_for_status()
+            error = False
+            return response
+        finally:
+            self._record(path, time.monotonic() - started, error)
+
+    def stats(self):
+        usage = self.usage()
+        with self._lock:
+            return {
+                'usage_percent': round(usage, 1),
+                'last_reported_percent': self._usage,
+                'regain_access_in_s': max(0, round(self._regain_at - time.time())),
+                'throttle': dict(self._throttle, delay_s=round(self._throttle['delay_s'], 1)),
+                'endpoints': {
+                    name: {
+                        'requests': s['requests'], 'errors': s['errors'],
+                        'avg_ms': round(s['total_ms'] / s['requests'], 1) if s['requests'] else 0.0,
+                        'max_ms': round(s['max_ms'], 1),
+                    }
+                    for name, s in self._endpoints.items()
+                },
+            }
+
+
+graph_client = GraphAPIClient(
+    access_token=FB_ACCESS_TOKEN, pool_size=GRAPH_POOL_SIZE,
+    timeout=(GRAPH_CONNECT_TIMEOUT, GRAPH_READ_TIMEOUT), max_retries=GRAPH_MAX_RETRIES,
+)
+
+
+def graph_api_stats():
+    return graph_client.stats()
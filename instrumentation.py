@@ -0,0 +1,26 @@
+import os
+import logging
+from flask import jsonify
+
+_providers = {}
+
+
+def register_stats_provider(name, provider):
+    """Registra una función sin argumentos que devuelve un dict de métricas para el endpoint de instrumentación."""
+    _providers[name] = provider
+
+
+def collect_stats():
+    stats = {'pid': os.getpid()}
+    for name, provider in _providers.items():
+        try:
+            stats[name] = provider()
+        except Exception as e:
+            logging.warning(f"No se pudieron obtener las métricas de '{name}': {e}")
+            stats[name] = {'error': str(e)}
+    return stats
+
+
+def register_instrumentation_routes(server, url='/_instrumentation'):
+    """Expone las métricas registradas como JSON en `url` del servidor Flask de Dash."""
+    server.add_url_rule(url, 'instrumentation', lambda: jsonify(collect_stats()))
@@ -6,6 +6,8 @@ import io
 import base64
 from wordcloud import WordCloud
 import logging
+from config import AI_INSIGHT_POLL_MS, AI_CHAT_STREAM_POLL_MS
+from ai_jobs import InsightJob, AI_INSIGHT_PENDING_TEXT
 
 # --- Funciones de UI reutilizables ---
 
@@ -14,11 +16,13 @@ def create_ai_chat_interface(tab_id_prefix):
     return dbc.Card([
         dbc.CardHeader(f"Chatea con SkyIntel AI 🤖 ({tab_id_prefix})", className="text-white bg-primary"),
         dbc.CardBody([
-            html.Div(id=f'{tab_id_prefix}-chat-history', style={'height': '150px', 'overflowY': 'scroll', 'border': '1px solid #ccc', 'padding': '10px', 'marginBottom': '10px', 'background': '#f8f9fa'}),
+            html.Div(id=f'{tab_id_prefix}-chat-history', children=[], style={'height': '150px', 'overflowY': 'scroll', 'border': '1px solid #ccc', 'padding': '10px', 'marginBottom': '10px', 'background': '#f8f9fa'}),
             dbc.InputGroup([
                 dbc.Input(id=f'{tab_id_prefix}-chat-input', placeholder="Pregúntale algo a la IA..."),
                 dbc.Button("Enviar", id=f'{tab_id_prefix}-chat-submit', color="primary", n_clicks=0),
-            ])
+            ]),
+            dcc.Store(id=f'{tab_id_prefix}-chat-stream'),
+            dcc.Interval(id=f'{tab_id_prefix}-chat-stream-poll', interval=AI_CHAT_STREAM_POLL_MS, disabled=True)
         ])
     ], className="mt-4")
 
@@ -29,6 +33,20 @@ def create_ai_insight_card(card_id_visible, title="🤖 Análisis IA SkyIntel"):
         html.P(id=card_id_visible)
     ]), className="mt-3 shadow-sm", color="light")
 
+def create_ai_insight_data(prefix, ai_insight):
+    """Contenedor oculto `{prefix}-ai-insight-data` con el texto del insight.
+
+    Si `ai_insight` es un trabajo en segundo plano (`submit_ai_insight`), se pinta un texto de
+    espera junto con el dcc.Store y el dcc.Interval que consulta `register_ai_insight_poll`.
+    """
+    if not isinstance(ai_insight, InsightJob):
+        return html.Div(ai_insight, id=f'{prefix}-ai-insight-data', style={'display': 'none'})
+    return html.Div([
+        html.Div(AI_INSIGHT_PENDING_TEXT, id=f'{prefix}-ai-insight-data', style={'display': 'none'}),
+        dcc.Store(id=f'{prefix}-ai-insight-job', data=ai_insight._asdict()),
+        dcc.Interval(id=f'{prefix}-ai-insight-poll', interval=AI_INSIGHT_POLL_MS),
+    ])
+
 def add_trendline(fig, df, x_col, y_col):
     """Añade una línea de tendencia a una figura de Plotly."""
     if not df.empty and y_col in df.columns and x_col in df.columns:
@@ -174,6 +192,7 @@ def create_web_social_layout(min_date_allowed, max_date_allowed, start_date_val,
         dbc.Row([
             dbc.Col(dcc.DatePickerRange(id='date-picker', min_date_allowed=min_date_allowed, max_date_allowed=max_date_allowed, start_date=start_date_val, end_date=end_date_val, display_format='YYYY-MM-DD', className='mb-2'), width=12, md=6),
         ], className="mb-4"),
+        dcc.Interval(id='date-bounds-poll', interval=3000, max_intervals=40),
         html.Hr(),
         dcc.Tabs(id='main-tabs-selector-ws', value='overview_ws', children=[
             dcc.Tab(label='Visión General del Negocio 🌐', value='overview_ws'),
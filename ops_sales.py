@@ -6,7 +6,7 @@ import plotly.graph_objects as go
 import numpy as np
 
 # Dependencias de tu proyecto
-from ai import get_openai_response
+from ai_jobs import run_ai_tasks
 from data_processing import unify_data, clean_df, safe_sorted_unique
 
 def register_ops_sales_callbacks(app):
@@ -209,12 +209,18 @@ def register_ops_sales_callbacks(app):
 
         # Insights IA
         context_cg = f"Datos comparativos: Vuelos/mes: {vuelos_mes_data.to_string()}\nIngresos/mes: {ingresos_mes_data.to_string()}\nGanancia/mes: {ganancia_mes_data.to_string()}"
-        ai_insight_comparativo = get_openai_response("Analiza tendencias comparativas de vuelos, ingresos y ganancias. Da un diagnóstico y una acción poderosa.", context_cg)
         context_vd = f"Top destinos por vuelos: {top_destinos_vuelos_data.head().to_string()}\nTop destinos por ganancia: {top_destinos_ganancia_data.head().to_string()}"
-        ai_insight_vuelos = get_openai_response("Analiza los top destinos por vuelos y ganancia. Diagnostica y sugiere una acción para optimizar rutas o rentabilidad.", context_vd)
         context_oa = f"Vuelos por operador: {vuelos_operador_data.head().to_string()}\nGanancia por aeronave: {ganancia_aeronave_data.head().to_string()}"
-        ai_insight_operadores = get_openai_response("Analiza rendimiento por operador y aeronave. ¿Qué diagnóstico y acción poderosa sugieres?", context_oa)
-        ai_insight_avanzado = get_openai_response("Con base en heatmaps y ticket promedio, ¿qué patrones de demanda u oportunidad se observan? Da un diagnóstico y una acción poderosa.", "\n".join(context_aa_parts)) if context_aa_parts else no_ai_insight
+        ai_tasks = {
+            'comparativo': ("Analiza tendencias comparativas de vuelos, ingresos y ganancias. Da un diagnóstico y una acción poderosa.", context_cg),
+            'vuelos': ("Analiza los top destinos por vuelos y ganancia. Diagnostica y sugiere una acción para optimizar rutas o rentabilidad.", context_vd),
+            'operadores': ("Analiza rendimiento por operador y aeronave. ¿Qué diagnóstico y acción poderosa sugieres?", context_oa),
+        }
+        if context_aa_parts:
+            ai_tasks['avanzado'] = ("Con base en heatmaps y ticket promedio, ¿qué patrones de demanda u oportunidad se observan? Da un diagnóstico y una acción poderosa.", "\n".join(context_aa_parts))
+        ai_insights = run_ai_tasks(ai_tasks)
+        ai_insight_comparativo, ai_insight_vuelos, ai_insight_operadores = ai_insights['comparativo'], ai_insights['vuelos'], ai_insights['operadores']
+        ai_insight_avanzado = ai_insights.get('avanzado', no_ai_insight)
 
         # Tabla
         display_columns = ['Año', 'Mes', 'Fecha y hora del vuelo', 'Destino', 'Operador', 'Aeronave', 'Número de pasajeros', 'Monto total a cobrar', 'Ganancia', 'Cliente', 'Fase actual']
@@ -0,0 +1,200 @@
+import os
+import time
+import logging
+import threading
+import pandas as pd
+import requests
+
+from config import POST_INSIGHTS_TIERS, POST_INSIGHTS_BATCH_SIZE, GA_STORE_DIR
+from cache import SharedPickle
+from graph_api import graph_client, GraphThrottled
+
+# Métrica de insights -> columna del DataFrame, por plataforma
+FB_INSIGHT_COLUMNS = {'post_impressions': 'impressions'}
+IG_INSIGHT_COLUMNS = {'impressions': 'impressions', 'reach': 'reach', 'total_interactions': 'engagement', 'video_views': 'video_views'}
+_EMPTY = {}
+
+
+def insight_values(post):
+    """{métrica: valor} del bloque `insights` de una publicación (vacío si no viene)."""
+    return {item.get('name'): (item.get('values') or (_EMPTY,))[0].get('value') for item in (post.get('insights') or _EMPTY).get('data', ())}
+
+
+def facebook_counters(post):
+    """{columna: valor} de me gusta, comentarios y compartidos de una publicación de Facebook."""
+    return {
+        'likes_count': ((post.get('likes') or _EMPTY).get('summary') or _EMPTY).get('total_count'),
+        'comments_count': ((post.get('comments') or _EMPTY).get('summary') or _EMPTY).get('total_count'),
+        'shares_count': (post.get('shares') or _EMPTY).get('count'),
+    }
+
+
+def instagram_counters(post):
+    return {'like_count': post.get('like_count'), 'comments_count': post.get('comments_count')}
+
+
+# plataforma -> (métricas de insights, columna de fecha de publicación, campos de contadores, extractor de contadores)
+INSIGHT_SOURCES = {
+    'facebook': (FB_INSIGHT_COLUMNS, 'created_time', 'likes.summary(true),comments.summary(true),shares', facebook_counters),
+    'instagram': (IG_INSIGHT_COLUMNS, 'timestamp', 'like_count,comments_count', instagram_counters),
+}
+
+
+def _object_missing(error):
+    """True si la API Graph respondió que alguno de los ids pedidos ya no existe (error 100)."""
+    response = getattr(error, 'response', None)
+    if response is None or response.status_code != 400:
+        return False
+    try:
+        return (response.json().get('error') or _EMPTY).get('code') == 100
+    except ValueError:
+        return False
+
+
+def refresh_interval(age_seconds, tiers=POST_INSIGHTS_TIERS):
+    """Segundos que valen los insights de una publicación con `age_seconds` de antigüedad.
+
+    `tiers` es una lista ordenada de (antigüedad máxima, intervalo); la última entrada
+    (antigüedad None) cubre el resto.
+    """
+    for max_age, interval in tiers:
+        if max_age is None or age_seconds < max_age:
+            return interval
+    return tiers[-1][1]
+
+
+class PostInsightsCache:
+    """Insights por publicación (id -> (valores, hora de descarga)) con refresco escalonado según la antigüedad del post."""
+
+    def __init__(self, batch_size, base_dir=None):
+        self.batch_size = batch_size
+        self._entries = {
+            platform: SharedPickle(os.path.join(base_dir, f"post_metrics_{platform}.pkl") if base_dir else None, default=dict, label='la caché de insights')
+            for platform in INSIGHT_SOURCES
+        }
+        self._locks = {platform: threading.Lock() for platform in INSIGHT_SOURCES}
+        self._lock = threading.Lock()
+        self._stats = {'posts_checked': 0, 'posts_refreshed': 0, 'deleted_posts_dropped': 0, 'requests': 0, 'errors': 0, 'throttled': 0, 'served_during_refresh': 0}
+
+    def _request(self, platform, chunk, fields, fetched, deleted):
+        """Pide un grupo de ids; si alguno ya no existe, parte el grupo en dos hasta aislarlo."""
+        metrics, _, _, counters = INSIGHT_SOURCES[platform]
+        try:
+            data = graph_client.get('', {'ids': ','.join(chunk), 'fields': fields}).json()
+        except GraphThrottled:
+            raise
+        except requests.exceptions.RequestException as e:
+            with self._lock:
+                self._stats['requests'] += 1
+            if not _object_missing(e):
+                raise
+            if len(chunk) == 1:
+                deleted.add(chunk[0])
+                return
+            half = len(chunk) // 2
+            self._request(platform, chunk[:half], fields, fetched, deleted)
+            self._request(platform, chunk[half:], fields, fetched, deleted)
+            return
+        with self._lock:
+            self._stats['requests'] += 1
+        for post_id in chunk:
+            post = data.get(post_id) or _EMPTY
+            values = {metrics[name]: value for name, value in insight_values(post).items() if name in metrics}
+            fetched[post_id] = dict(values, **counters(post))
+
+    def _fetch(self, platform, post_ids):
+        """({id: {columna: valor}}, ids borrados) de `post_ids` en grupos de `batch_size`; los grupos que fallan se omiten.
+
+        Si la cuota de la API Graph no permite más llamadas se deja de pedir y el resto conserva
+        los valores que ya tenía.
+        """
+        metrics, _, counter_fields, _ = INSIGHT_SOURCES[platform]
+        fields = f"{counter_fields},insights.metric({','.join(metrics)})"
+        fetched, deleted = {}, set()
+        for i in range(0, len(post_ids), self.batch_size):
+            chunk = post_ids[i:i + self.batch_size]
+            try:
+                self._request(platform, chunk, fields, fetched, deleted)
+            except GraphThrottled as e:
+                logging.warning(f"Insights de {platform} aplazados: {e}")
+                with self._lock:
+                    self._stats['throttled'] += 1
+                break
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Error obteniendo insights de {len(chunk)} publicaciones de {platform}: {e}")
+                with self._lock:
+                    self._stats['errors'] += 1
+        return fetched, deleted
+
+    def apply(self, platform, df):
+        """Rellena las columnas de insights y contadores de `df` desde la caché, pidiendo antes solo las obsoletas.
+
+        La caché es la única fuente de esas columnas (los feeds no las piden); si un post no tiene
+        valores en caché (p. ej. el refresco falló) se conserva lo que traiga `df`. Si otra petición está refrescando la plataforma (quizá espaciada por la cuota de la API
+        Graph) no se espera: se usan los valores que ya hay en memoria.
+        """
+        metrics, time_col, _, counters = INSIGHT_SOURCES[platform]
+        if df.empty:
+            return df
+        post_ids = df['id'].astype(str)
+        now = time.time()
+        ages = (pd.Timestamp.now('UTC').tz_localize(None) - df[time_col]).dt.total_seconds().fillna(0)
+
+        lock = self._locks[platform]
+        stale = []
+        if lock.acquire(blocking=False):
+            try:
+                entries = self._entries[platform].get()
+                stale = [
+                    post_id for post_id, age in zip(post_ids, ages)
+                    if post_id not in entries or now - entries[post_id][1] > refresh_interval(age)
+                ]
+                if stale:
+                    fetched, deleted = self._fetch(platform, list(dict.fromkeys(stale)))
+                    entries.update((post_id, (values, now)) for post_id, values in fetched.items())
+                    # Marca de borrado: se conserva para no volver a pedir el id en cada refresco
+                    entries.update((post_id, (None, now)) for post_id in deleted)
+                    if fetched or deleted:
+                        self._entries[platform].set(entries)
+            finally:
+                lock.release()
+        else:
+            entries = self._entries[platform].peek() or _EMPTY
+            with self._lock:
+                self._stats['served_during_refresh'] += 1
+        cached = {post_id: entries[post_id][0] for post_id in post_ids if post_id in entries}
+        gone = {post_id for post_id, values in cached.items() if values is None}
+        with self._lock:
+            self._stats['posts_checked'] += len(post_ids)
+            self._stats['posts_refreshed'] += len(stale)
+            self._stats['deleted_posts_dropped'] += len(gone)
+        if gone:
+            keep = ~post_ids.isin(gone)
+            df, post_ids = df[keep].reset_index(drop=True), post_ids[keep].reset_index(drop=True)
+            cached = {post_id: values for post_id, values in cached.items() if values is not None}
+
+        columns = list(metrics.values()) + list(counters(_EMPTY))
+        values = pd.DataFrame.from_dict(cached, orient='index', columns=columns)
+        values = values.reindex(post_ids).set_axis(df.index)
+        df = df.copy()
+        df[columns] = values.combine_first(df[columns])[columns].apply(pd.to_numeric, errors='coerce').fillna(0).astype('int64')
+        return df
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        for platform, entries in self._entries.items():
+            stats[f"{platform}_posts_cached"] = len(entries.peek() or ())
+        return stats
+
+
+_cache = PostInsightsCache(batch_size=POST_INSIGHTS_BATCH_SIZE, base_dir=GA_STORE_DIR or None)
+
+
+def apply_post_insights(platform, df):
+    """DataFrame procesado de 'facebook' o 'instagram' con los insights de la caché escalonada."""
+    return _cache.apply(platform, df)
+
+
+def post_insights_stats():
+    return _cache.stats()
\ No newline at end of file
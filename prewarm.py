@@ -0,0 +1,235 @@
+import os
+import glob
+import time
+import random
+import logging
+import threading
+from datetime import timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo proceso, no hace falta el candado
+    fcntl = None
+
+from flask import request
+
+from config import PREWARM_ENABLED, PREWARM_INTERVAL, PREWARM_JITTER, PREWARM_IDLE_SECONDS, PREWARM_LOCK_PATH
+from date_bounds import get_bounds, initial_bounds
+from graph_api import graph_priority
+from ai_jobs import ai_background, wait_background_ai
+from callbacks_ga import build_google_subtab_content
+from callbacks_social import build_social_subtab_content
+from web_social import build_main_tab_content_ws
+
+GA_SUBTABS = ['overview_ga', 'demography_ga', 'funnels_ga', 'temporal_ga', 'correlations_ga', 'cohort_ga', 'what_if_ga']
+SOCIAL_SUBTABS = ['general_sm', 'engagement_sm', 'wordmap_sm', 'top_posts_sm']
+# Un archivo por worker con sus peticiones en curso (0/1); su mtime es el último cambio de estado
+_ACTIVITY_PATTERN = os.path.join(os.path.dirname(PREWARM_LOCK_PATH) or '.', 'prewarm-activity.{pid}')
+_ACTIVITY_INTERVAL = 1.0  # Segundos entre comprobaciones del hilo que publica la actividad
+
+_lock = threading.Lock()
+_scheduler_pid = None
+_lock_file = None
+_active_requests = 0
+_last_request = 0.0
+_stats = {'cycles': 0, 'jobs_run': 0, 'jobs_failed': 0, 'last_cycle_s': None, 'last_cycle_at': None, 'leader': False}
+
+
+def _publish_activity(active):
+    """Publica para los demás workers si este tiene peticiones en curso."""
+    path = _ACTIVITY_PATTERN.format(pid=os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", 'w') as f:
+            f.write('1' if active else '0')
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        logging.warning(f"No se pudo publicar la actividad del worker en {path}: {e}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _other_workers_busy():
+    """True si algún otro worker vivo tiene peticiones en curso o las tuvo hace menos de PREWARM_IDLE_SECONDS."""
+    for path in glob.glob(_ACTIVITY_PATTERN.format(pid='*')):
+        pid = path.rsplit('.', 1)[-1]
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            if not _pid_alive(int(pid)):
+                os.remove(path)
+                continue
+            with open(path) as f:
+                active = f.read().strip() != '0'
+            if active or time.time() - os.path.getmtime(path) < PREWARM_IDLE_SECONDS:
+                return True
+        except OSError:
+            continue
+    return False
+
+
+def _activity_loop():
+    """Publica la actividad del worker fuera de las peticiones, como mucho una vez cada _ACTIVITY_INTERVAL segundos.
+
+    Solo escribe si cambió el estado o, estando inactivo, si hubo peticiones desde la última vez.
+    """
+    published = None
+    while True:
+        with _lock:
+            state = (True, None) if _active_requests else (False, _last_request)
+        if state != published:
+            _publish_activity(state[0])
+            published = state
+        time.sleep(_ACTIVITY_INTERVAL)
+
+
+def _request_started():
+    global _active_requests, _last_request
+    _ensure_scheduler()
+    if request.path.startswith('/_instrumentation'):
+        return
+    with _lock:
+        _active_requests += 1
+        _last_request = time.monotonic()
+
+
+def _request_finished(exc=None):
+    global _active_requests, _last_request
+    if request.path.startswith('/_instrumentation'):
+        return
+    with _lock:
+        _active_requests = max(0, _active_requests - 1)
+        _last_request = time.monotonic()
+
+
+def _wait_until_idle():
+    """Espera a que no haya peticiones en curso ni recientes en ningún worker; el pre-calentado cede ante el tráfico interactivo."""
+    while True:
+        with _lock:
+            busy = _active_requests > 0 or time.monotonic() - _last_request < PREWARM_IDLE_SECONDS
+        if not busy and not _other_workers_busy():
+            return
+        time.sleep(1)
+
+
+def _acquire_leader_lock():
+    """Solo el worker de gunicorn que obtiene el candado de archivo pre-calienta; se mantiene mientras vive el proceso."""
+    global _lock_file
+    if _lock_file is not None or fcntl is None:
+        return True
+    try:
+        os.makedirs(os.path.dirname(PREWARM_LOCK_PATH) or '.', exist_ok=True)
+        f = open(PREWARM_LOCK_PATH, 'a')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        _lock_file = f
+        return True
+    except OSError as e:
+        logging.warning(f"No se pudo abrir el candado de pre-calentado {PREWARM_LOCK_PATH}: {e}")
+        return False
+
+
+def _default_window():
+    """Ventana por defecto del DatePicker: los últimos 30 días hasta la fecha máxima disponible."""
+    max_date = (get_bounds() or initial_bounds())[1]
+    return (max_date - timedelta(days=30)).isoformat(), max_date.isoformat()
+
+
+def prewarm_jobs():
+    """Vistas por defecto a construir.
+
+    Lo que dejan en disco (almacén diario GA4, snapshot social, insights por publicación, caché
+    de IA en SQLite) lo aprovechan todos los workers, que releen esos archivos cuando cambian.
+    En las vistas sin almacén en disco (demografía, funnels, correlaciones, cohortes) lo
+    compartido es el insight IA: cada worker repite su consulta GA4 y encuentra el texto en la
+    caché de IA.
+    """
+    start_date, end_date = _default_window()
+    jobs = [('overview_ws', lambda: build_main_tab_content_ws('overview_ws', start_date, end_date))]
+    jobs += [(tab, lambda tab=tab: build_google_subtab_content(tab, start_date, end_date)) for tab in GA_SUBTABS]
+    jobs += [(tab, lambda tab=tab: build_social_subtab_content(tab, start_date, end_date)) for tab in SOCIAL_SUBTABS]
+    return jobs
+
+
+def run_prewarm_cycle():
+    """Construye cada vista por defecto para dejar GA, Facebook/Instagram y OpenAI en las cachés.
+
+    Las llamadas a la API Graph van con prioridad 'background': se espacian o aplazan si la cuota se acerca al límite.
+    Los insights IA van a un pool propio de un hilo y se espera a que terminen antes de la vista siguiente, así
+    nunca ocupan el pool de los usuarios ni se acumulan.
+    """
+    started = time.monotonic()
+    for name, job in prewarm_jobs():
+        _wait_until_idle()
+        try:
+            with graph_priority('background'), ai_background():
+                job()
+            wait_background_ai()
+            _stats['jobs_run'] += 1
+        except Exception as e:
+            _stats['jobs_failed'] += 1
+            logging.error(f"Error pre-calentando '{name}': {e}")
+    _stats['cycles'] += 1
+    _stats['last_cycle_s'] = round(time.monotonic() - started, 2)
+    _stats['last_cycle_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    logging.info(f"Pre-calentado completado en {_stats['last_cycle_s']}s")
+
+
+def _scheduler_loop():
+    time.sleep(random.uniform(0, PREWARM_JITTER))
+    while True:
+        _stats['leader'] = _acquire_leader_lock()
+        if _stats['leader']:
+            run_prewarm_cycle()
+        time.sleep(max(0.0, PREWARM_INTERVAL + random.uniform(-PREWARM_JITTER, PREWARM_JITTER)))
+
+
+def _ensure_scheduler():
+    """Lanza los hilos de pre-calentado y de publicación de actividad una vez por proceso."""
+    global _scheduler_pid
+    with _lock:
+        if _scheduler_pid == os.getpid():
+            return
+        _scheduler_pid = os.getpid()
+    threading.Thread(target=_activity_loop, name='prewarm-activity', daemon=True).start()
+    threading.Thread(target=_scheduler_loop, name='prewarm-scheduler', daemon=True).start()
+
+
+def _after_fork():
+    """En el hijo recién creado: el candado y los contadores heredados no son de este proceso."""
+    global _lock, _active_requests
+    _lock = threading.Lock()
+    _active_requests = 0
+    _ensure_scheduler()
+
+
+def start_prewarm_scheduler(server):
+    """Registra el seguimiento de tráfico en Flask y el arranque del hilo de pre-calentado.
+
+    El hilo no se lanza al importar: con `gunicorn --preload` la importación ocurre en el
+    master, que no atiende peticiones. Se lanza justo después del fork de cada worker y, en
+    los procesos que nunca hacen fork (servidor de desarrollo, gunicorn sin --preload), con
+    la primera petición.
+    """
+    if not PREWARM_ENABLED:
+        return
+    server.before_request(_request_started)
+    server.teardown_request(_request_finished)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_after_fork)
+
+
+def prewarm_stats():
+    with _lock:
+        return dict(_stats, enabled=PREWARM_ENABLED, active_requests=_active_requests)
@@ -0,0 +1,27 @@
+import os
+import threading
+
+
+class ProcessLocal:
+    """Valor creado la primera vez que se pide en cada proceso; tras un fork se vuelve a crear con `factory`."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._value = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        # El candado heredado puede haber quedado tomado por un hilo que no existe en el hijo
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._pid == os.getpid():
+            return self._value
+        with self._lock:
+            if self._pid != os.getpid():
+                self._value = self._factory()
+                self._pid = os.getpid()
+            return self._value
\ No newline at end of file
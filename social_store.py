@@ -0,0 +1,173 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+import pandas as pd
+
+from config import FACEBOOK_ID, INSTAGRAM_ID, SOCIAL_SNAPSHOT_TTL, SOCIAL_FETCH_DEADLINE, SOCIAL_FETCH_WORKERS, GA_STORE_DIR
+from data_processing import load_facebook_posts, load_instagram_posts, process_facebook_posts, process_instagram_posts
+from graph_api import GraphThrottled
+from post_insights import apply_post_insights
+from cache import SharedPickle
+from process_local import ProcessLocal
+
+# plataforma -> (cuenta, cargador(cuenta, inicio, fin), columna de fecha, DataFrame vacío)
+SOCIAL_SOURCES = {
+    'facebook': (FACEBOOK_ID, load_facebook_posts, 'created_time', lambda: process_facebook_posts([])),
+    'instagram': (INSTAGRAM_ID, load_instagram_posts, 'timestamp', lambda: process_instagram_posts([])),
+}
+
+
+class SocialSnapshotStore:
+    """Snapshot por plataforma de las publicaciones procesadas (en disco si hay `base_dir`), ampliado hacia atrás o refrescado cada `ttl` segundos."""
+
+    def __init__(self, ttl, base_dir=None):
+        self.ttl = ttl
+        self.base_dir = base_dir
+        self._snapshots = {
+            platform: SharedPickle(os.path.join(base_dir, f"social_{platform}.pkl") if base_dir else None, label='el snapshot social')
+            for platform in SOCIAL_SOURCES
+        }
+        self._locks = {platform: threading.Lock() for platform in SOCIAL_SOURCES}
+        self._lock = threading.Lock()
+        self._stats = {'slices_served': 0, 'full_loads': 0, 'backfills': 0, 'incremental_refreshes': 0, 'refresh_errors': 0, 'throttled_refreshes': 0, 'served_during_refresh': 0, 'posts_fetched': 0}
+
+    @staticmethod
+    def _own(platform, snapshot):
+        """El snapshot si es de la cuenta configurada (None si no hay o es de otra cuenta)."""
+        return snapshot if snapshot is not None and snapshot.get('account') == SOCIAL_SOURCES[platform][0] else None
+
+    def _load(self, platform):
+        return self._own(platform, self._snapshots[platform].get())
+
+    def _save(self, platform, snapshot):
+        self._snapshots[platform].set(snapshot)
+
+    def _fetch(self, platform, start, end):
+        account, loader, _, _ = SOCIAL_SOURCES[platform]
+        df = loader(account, start, end)
+        with self._lock:
+            self._stats['posts_fetched'] += len(df)
+        return df
+
+    @staticmethod
+    def _merge(df, new_df):
+        if new_df.empty:
+            return df
+        if df.empty:
+            return new_df.reset_index(drop=True)
+        return pd.concat([df, new_df], ignore_index=True).drop_duplicates('id', keep='last').reset_index(drop=True)
+
+    def query(self, platform, start_date, end_date):
+        """Publicaciones de `platform` con fecha entre `start_date` y `end_date` (corte del snapshot).
+
+        Si falla la carga inicial se lanza la excepción; si falla una ampliación o un refresco (o se
+        aplaza por el uso de la cuota de la API Graph) se sigue sirviendo el snapshot que ya había.
+        Si otra petición está actualizando el snapshot (p. ej. un refresco del pre-calentado que la
+        cuota está espaciando) y el snapshot en memoria ya cubre `start_date`, se sirve sin esperar
+        a que termine; si no lo cubre se espera para poder ampliarlo.
+        """
+        _, _, time_col, _ = SOCIAL_SOURCES[platform]
+        start, end = pd.to_datetime(start_date).tz_localize(None), pd.to_datetime(end_date).tz_localize(None)
+
+        lock = self._locks[platform]
+        if not lock.acquire(blocking=False):
+            snapshot = self._own(platform, self._snapshots[platform].peek())
+            if snapshot is not None and start >= snapshot['since']:
+                with self._lock:
+                    self._stats['served_during_refresh'] += 1
+                    self._stats['slices_served'] += 1
+                return self._slice(snapshot['df'], time_col, start, end)
+            lock.acquire()
+        try:
+            df = self._refresh(platform, start)
+        finally:
+            lock.release()
+        return self._slice(df, time_col, start, end)
+
+    @staticmethod
+    def _slice(df, time_col, start, end):
+        if df.empty:
+            return df.copy()
+        return df[(df[time_col] >= start) & (df[time_col] <= end)].reset_index(drop=True)
+
+    def _refresh(self, platform, start):
+        """Carga, amplía o refresca el snapshot según haga falta (con el candado de la plataforma) y devuelve su DataFrame."""
+        _, _, time_col, _ = SOCIAL_SOURCES[platform]
+        today = pd.Timestamp(datetime.now().date())
+        snapshot = self._load(platform)
+        now = datetime.now()
+        if snapshot is None:
+            df = self._fetch(platform, start, today)
+            snapshot = {'account': SOCIAL_SOURCES[platform][0], 'df': df, 'since': start, 'fetched_at': now}
+            self._stats['full_loads'] += 1
+            self._save(platform, snapshot)
+        else:
+            changed = False
+            try:
+                if start < snapshot['since']:
+                    older = self._fetch(platform, start, snapshot['since'])
+                    snapshot = dict(snapshot, df=self._merge(snapshot['df'], older), since=start)
+                    self._stats['backfills'] += 1
+                    changed = True
+                if (now - snapshot['fetched_at']).total_seconds() > self.ttl:
+                    df = snapshot['df']
+                    latest = df[time_col].max() if not df.empty else snapshot['since']
+                    newer = self._fetch(platform, latest, today)
+                    snapshot = dict(snapshot, df=apply_post_insights(platform, self._merge(df, newer)), fetched_at=now)
+                    self._stats['incremental_refreshes'] += 1
+                    changed = True
+            except GraphThrottled as e:
+                logging.warning(f"Snapshot de {platform} no actualizado; se sirve el anterior: {e}")
+                self._stats['throttled_refreshes'] += 1
+            except Exception as e:
+                logging.error(f"Error actualizando el snapshot de {platform}; se sirve el anterior: {e}")
+                self._stats['refresh_errors'] += 1
+            if changed:
+                self._save(platform, snapshot)
+        self._stats['slices_served'] += 1
+        return snapshot['df']
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        for platform, shared in self._snapshots.items():
+            snapshot = self._own(platform, shared.peek())
+            if snapshot is not None:
+                stats[platform] = {'posts': len(snapshot['df']), 'since': str(snapshot['since'].date()), 'fetched_at': snapshot['fetched_at'].isoformat(timespec='seconds')}
+        return stats
+
+
+_store = SocialSnapshotStore(ttl=SOCIAL_SNAPSHOT_TTL, base_dir=GA_STORE_DIR or None)
+_executor = ProcessLocal(lambda: ThreadPoolExecutor(max_workers=SOCIAL_FETCH_WORKERS, thread_name_prefix='social-feed'))
+
+
+def query_social_feeds(start_date, end_date, platforms=('facebook', 'instagram'), deadline=SOCIAL_FETCH_DEADLINE):
+    """Consulta las plataformas en paralelo y devuelve sus DataFrames en el mismo orden.
+
+    Cada plataforma es independiente: si una falla (p. ej. token caducado) o no termina antes de
+    `deadline` segundos, solo esa se devuelve vacía y la otra se muestra igual. Los hilos heredan
+    el contexto de quien llama (p. ej. la prioridad de las llamadas a la API Graph).
+    """
+    started = time.monotonic()
+    futures = [_executor.get().submit(contextvars.copy_context().run, _store.query, platform, start_date, end_date) for platform in platforms]
+    done, _ = wait(futures, timeout=deadline)
+    results = []
+    for platform, future in zip(platforms, futures):
+        if future not in done:
+            logging.warning(f"La consulta de {platform} no terminó en {deadline}s; se muestra vacía.")
+        elif future.exception() is not None:
+            logging.error(f"Error obteniendo publicaciones de {platform}: {future.exception()}")
+        else:
+            results.append(future.result())
+            continue
+        results.append(SOCIAL_SOURCES[platform][3]())
+    logging.info(f"Publicaciones de {', '.join(platforms)} obtenidas en {time.monotonic() - started:.2f}s")
+    return results
+
+
+def social_store_stats():
+    return _store.stats()
@@ -1,59 +1,215 @@
 import pandas as pd
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import DateRange, Dimension, Metric, RunReportRequest
-from google.oauth2 import service_account
+import numpy as np
+import re
+from datetime import date, datetime, timedelta
+from google.analytics.data_v1beta.types import BatchRunReportsRequest, DateRange, Dimension, Metric, MetricType, RunReportRequest
 import logging
-from config import GA_PROPERTY_ID, GA_KEY_PATH
+from config import GA_PROPERTY_ID, GA_KEY_PATH, GA_PAGE_SIZE, GA_CACHE_TTL, GA_CACHE_HISTORICAL_TTL, GA_CACHE_MAX_MB, GA_DATA_FINAL_DAYS
+from ga_client import get_ga_client
+from cache import TTLLRUCache
+from ga_filters import compile_filter, compile_order_bys
 
 logging.basicConfig(level=logging.INFO)
 
-def query_ga(metrics, dimensions, start_date='30daysAgo', end_date='today', property_id=GA_PROPERTY_ID, key_path=GA_KEY_PATH):
-    """Función genérica para consultar datos de GA4."""
+GA_BATCH_SIZE = 5  # Máximo de reportes por BatchRunReportsRequest que acepta la API de GA4
+GA_METRIC_DTYPES = {MetricType.TYPE_INTEGER: np.int64}  # El resto de tipos (float, segundos, moneda...) como float64
+GA_QUERY_OPTIONS = ('dimension_filter', 'metric_filter', 'order_bys', 'limit')  # Opciones de servidor de query_ga (ver ga_filters)
+
+# Caché de resultados de query_ga, acotada por la memoria que ocupan los DataFrames
+_ga_cache = TTLLRUCache(max_bytes=int(GA_CACHE_MAX_MB * 1024 * 1024), sizeof=lambda df: int(df.memory_usage(deep=True).sum()))
+
+def resolve_ga_date(value, today=None):
+    """Convierte una fecha de GA4 ('today', 'yesterday', 'NdaysAgo' o 'YYYY-MM-DD') en `date`."""
+    today = today or date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value == 'today':
+        return today
+    if value == 'yesterday':
+        return today - timedelta(days=1)
+    match = re.fullmatch(r'(\d+)daysAgo', value)
+    if match:
+        return today - timedelta(days=int(match.group(1)))
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def _cache_ttl(end_date):
+    """TTL corto para rangos que incluyen días aún no consolidados por GA4; largo para rangos históricos."""
+    try:
+        if resolve_ga_date(end_date) < date.today() - timedelta(days=GA_DATA_FINAL_DAYS):
+            return GA_CACHE_HISTORICAL_TTL
+    except (ValueError, TypeError):
+        pass
+    return GA_CACHE_TTL
+
+def _cache_key(metrics, dimensions, start_date, end_date, property_id, dimension_filter=None, metric_filter=None, order_bys=None, limit=None):
+    return (str(property_id), tuple(metrics), tuple(dimensions), str(start_date), str(end_date), dimension_filter, metric_filter, tuple(order_bys or ()), limit)
+
+def _report_options(report):
+    """Opciones de servidor (filtros, orden, límite) de un reporte expresado como dict."""
+    return {option: report.get(option) for option in GA_QUERY_OPTIONS}
+
+def ga_cache_stats():
+    """Contadores de la caché de query_ga (hits, misses, desalojos, bytes usados)."""
+    return _ga_cache.stats()
+
+def _page_limit(page_size, offset, limit):
+    """Filas a pedir en la página que empieza en `offset` sin pasar del límite total `limit`."""
+    page_size = page_size or GA_PAGE_SIZE
+    return page_size if limit is None else max(min(page_size, limit - offset), 0)
+
+def _build_report_request(metrics, dimensions, start_date, end_date, property_id=None, page_limit=None, offset=0, dimension_filter=None, metric_filter=None, order_bys=None):
+    """Construye el RunReportRequest de un reporte (sin propiedad cuando va dentro de un batch)."""
+    return RunReportRequest(
+        property=f"properties/{property_id}" if property_id else None,
+        dimensions=[Dimension(name=d) for d in dimensions],
+        metrics=[Metric(name=m) for m in metrics],
+        date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
+        dimension_filter=compile_filter(dimension_filter),
+        metric_filter=compile_filter(metric_filter),
+        order_bys=compile_order_bys(order_bys, metrics),
+        keep_empty_rows=True,
+        limit=page_limit or GA_PAGE_SIZE,
+        offset=offset
+    )
+
+def _metric_dtype(metric_type):
+    """dtype declarado para una métrica según su MetricType (enteros como int64, el resto float64)."""
+    return GA_METRIC_DTYPES.get(metric_type, np.float64)
+
+def _parse_metric(values, dtype):
+    """Convierte en una sola pasada vectorizada un arreglo de textos de métricas al dtype declarado."""
     try:
-        credentials = service_account.Credentials.from_service_account_file(
-            key_path, scopes=['https://www.googleapis.com/auth/analytics.readonly']
-        )
-        ga_client = BetaAnalyticsDataClient(credentials=credentials)
-        request = RunReportRequest(
-            property=f"properties/{property_id}",
-            dimensions=[Dimension(name=d) for d in dimensions],
-            metrics=[Metric(name=m) for m in metrics],
-            date_ranges=[DateRange(start_date=start_date, end_date=end_date)],
-            keep_empty_rows=True
-        )
+        return values.astype(dtype)
+    except (ValueError, TypeError):
+        return np.nan_to_num(pd.to_numeric(values, errors='coerce').astype(np.float64), nan=0.0).astype(dtype)
+
+def _response_columns(response):
+    """Decodifica un RunReportResponse en columnas tipadas (nombre -> arreglo numpy).
+
+    Trabaja sobre el protobuf crudo (sin el envoltorio proto-plus por fila), llena arreglos
+    preasignados por columna y parsea cada métrica de una vez con su dtype declarado.
+    """
+    pb = type(response).pb(response)
+    n_rows = len(pb.rows)
+    dim_names = [h.name for h in pb.dimension_headers]
+    metric_headers = [(h.name, _metric_dtype(h.type_)) for h in pb.metric_headers]
+    dim_cols = [np.empty(n_rows, dtype=object) for _ in dim_names]
+    metric_cols = [np.empty(n_rows, dtype=object) for _ in metric_headers]
+    for i, row in enumerate(pb.rows):
+        for col, value in zip(dim_cols, row.dimension_values):
+            col[i] = value.value
+        for col, value in zip(metric_cols, row.metric_values):
+            col[i] = value.value
+    columns = dict(zip(dim_names, dim_cols))
+    columns.update((name, _parse_metric(col, dtype)) for (name, dtype), col in zip(metric_headers, metric_cols))
+    return columns
+
+def _columns_to_df(chunks, metrics, dimensions):
+    """Arma una sola vez el DataFrame de query_ga a partir de los bloques de columnas de cada página."""
+    chunks = [chunk for chunk in chunks if chunk and len(next(iter(chunk.values()))) > 0]
+    if not chunks:
+        logging.warning(f"No se devolvieron datos para: {metrics}, {dimensions}")
+        return pd.DataFrame(columns=dimensions + metrics)
+
+    if len(chunks) == 1:
+        data = chunks[0]
+    else:
+        data = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+    df = pd.DataFrame(data, copy=False)
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], format='%Y%m%d', errors='coerce')
+    if 'firstSessionDate' in df.columns:
+        df['firstSessionDate'] = pd.to_datetime(df['firstSessionDate'], format='%Y%m%d', errors='coerce')
+    if 'nthDay' in df.columns:
+        df['nthDay'] = pd.to_numeric(df['nthDay'], errors='coerce').fillna(0).astype(int)
+
+    return df.dropna(subset=[col for col in ['date', 'firstSessionDate'] if col in df.columns])
+
+def iter_ga_report(metrics, dimensions, start_date='30daysAgo', end_date='today', property_id=GA_PROPERTY_ID, key_path=GA_KEY_PATH, page_size=None, offset=0, dimension_filter=None, metric_filter=None, order_bys=None, limit=None):
+    """Recorre un reporte de GA4 página a página siguiendo `row_count`/`offset`.
+
+    Produce un bloque de columnas (dict nombre -> arreglo) por página, a medida que llegan, y se
+    detiene al llegar a `row_count` o a `limit` filas. Propaga los errores de la API.
+    """
+    ga_client = get_ga_client(property_id, key_path)
+    while _page_limit(page_size, offset, limit) > 0:
+        request = _build_report_request(metrics, dimensions, start_date, end_date, property_id, _page_limit(page_size, offset, limit), offset, dimension_filter, metric_filter, order_bys)
         response = ga_client.run_report(request)
-        rows = []
-        dim_headers = [d.name for d in response.dimension_headers]
-        metric_headers = [m.name for m in response.metric_headers]
-
-        for row in response.rows:
-            d_values = {dim_headers[i]: row.dimension_values[i].value for i in range(len(dim_headers))}
-            m_values = {}
-            for i in range(len(metric_headers)):
-                value_str = row.metric_values[i].value
-                try:
-                    m_values[metric_headers[i]] = float(value_str)
-                except (ValueError, TypeError):
-                    m_values[metric_headers[i]] = 0.0
-            rows.append({**d_values, **m_values})
-
-        if not rows:
-            logging.warning(f"No se devolvieron datos para: {metrics}, {dimensions}")
-            return pd.DataFrame(columns=dimensions + metrics)
-
-        df = pd.DataFrame(rows)
-        if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'], format='%Y%m%d', errors='coerce')
-        if 'firstSessionDate' in df.columns:
-            df['firstSessionDate'] = pd.to_datetime(df['firstSessionDate'], format='%Y%m%d', errors='coerce')
-        if 'nthDay' in df.columns:
-            df['nthDay'] = pd.to_numeric(df['nthDay'], errors='coerce').fillna(0).astype(int)
-
-        for m in metrics:
-            if m in df.columns:
-                df[m] = pd.to_numeric(df[m], errors='coerce').fillna(0)
-
-        return df.dropna(subset=[col for col in ['date', 'firstSessionDate'] if col in df.columns])
+        yield _response_columns(response)
+        offset += len(response.rows)
+        if not response.rows or offset >= response.row_count:
+            break
+
+def _fetch_report(metrics, dimensions, start_date, end_date, property_id, key_path, page_size=None, **options):
+    """Descarga un reporte completo (todas sus páginas) sin pasar por la caché."""
+    return _columns_to_df(iter_ga_report(metrics, dimensions, start_date, end_date, property_id, key_path, page_size, **options), metrics, dimensions)
+
+def query_ga(metrics, dimensions, start_date='30daysAgo', end_date='today', property_id=GA_PROPERTY_ID, key_path=GA_KEY_PATH, dimension_filter=None, metric_filter=None, order_bys=None, limit=None):
+    """Función genérica para consultar datos de GA4.
+
+    `dimension_filter`/`metric_filter` (expresiones de ga_filters), `order_bys` y `limit` se envían
+    a GA4 para que el servidor filtre, ordene y recorte las filas antes de responder.
+    """
+    options = {'dimension_filter': dimension_filter, 'metric_filter': metric_filter, 'order_bys': order_bys, 'limit': limit}
+    key = _cache_key(metrics, dimensions, start_date, end_date, property_id, **options)
+    cached = _ga_cache.get(key)
+    if cached is not None:
+        return cached.copy()
+    try:
+        df = _fetch_report(metrics, dimensions, start_date, end_date, property_id, key_path, **options)
+        _ga_cache.set(key, df, _cache_ttl(end_date))
+        return df.copy()
     except Exception as e:
         logging.error(f"Error consultando GA4 ({metrics}/{dimensions}): {e}")
-        return pd.DataFrame(columns=dimensions + metrics)
\ No newline at end of file
+        return pd.DataFrame(columns=dimensions + metrics)
+
+def fetch_ga_batch(reports, property_id=GA_PROPERTY_ID, key_path=GA_KEY_PATH):
+    """Envía hasta GA_BATCH_SIZE reportes (dicts con metrics/dimensions/start_date/end_date y opciones
+    de servidor) en un BatchRunReportsRequest, sin pasar por la caché. Propaga los errores de la API.
+
+    Los reportes que no caben en la primera página se completan con iter_ga_report.
+    """
+    ga_client = get_ga_client(property_id, key_path)
+    requests = []
+    for r in reports:
+        options = _report_options(r)
+        requests.append(_build_report_request(
+            r['metrics'], r['dimensions'], r['start_date'], r['end_date'], page_limit=_page_limit(None, 0, options['limit']),
+            dimension_filter=options['dimension_filter'], metric_filter=options['metric_filter'], order_bys=options['order_bys']
+        ))
+    response = ga_client.batch_run_reports(BatchRunReportsRequest(property=f"properties/{property_id}", requests=requests))
+    results = []
+    for r, resp in zip(reports, response.reports):
+        chunks = [_response_columns(resp)]
+        if resp.rows and len(resp.rows) < resp.row_count:
+            chunks.extend(iter_ga_report(r['metrics'], r['dimensions'], r['start_date'], r['end_date'], property_id, key_path, offset=len(resp.rows), **_report_options(r)))
+        results.append(_columns_to_df(chunks, r['metrics'], r['dimensions']))
+    return results
+
+def query_ga_batch(reports, start_date='30daysAgo', end_date='today', property_id=GA_PROPERTY_ID, key_path=GA_KEY_PATH):
+    """Ejecuta varios reportes de GA4 con BatchRunReportsRequest (hasta 5 por llamada).
+
+    `reports` es una lista de dicts con las claves `metrics` y `dimensions` (y opcionalmente
+    `start_date`/`end_date` para sobrescribir el rango común, y las opciones de servidor de
+    `query_ga`: `dimension_filter`, `metric_filter`, `order_bys`, `limit`). Devuelve una lista de DataFrames
+    en el mismo orden, con el mismo formato que `query_ga`; si un batch falla, sus reportes
+    se devuelven vacíos.
+    """
+    reports = [{**r, 'start_date': r.get('start_date', start_date), 'end_date': r.get('end_date', end_date)} for r in reports]
+    keys = [_cache_key(r['metrics'], r['dimensions'], r['start_date'], r['end_date'], property_id, **_report_options(r)) for r in reports]
+    results = [_ga_cache.get(key) for key in keys]
+    pending = [i for i, df in enumerate(results) if df is None]
+
+    for i in range(0, len(pending), GA_BATCH_SIZE):
+        chunk = pending[i:i + GA_BATCH_SIZE]
+        try:
+            for j, df in zip(chunk, fetch_ga_batch([reports[j] for j in chunk], property_id, key_path)):
+                results[j] = df
+                _ga_cache.set(keys[j], results[j], _cache_ttl(reports[j]['end_date']))
+        except Exception as e:
+            logging.error(f"Error consultando GA4 en batch ({[reports[j]['dimensions'] for j in chunk]}): {e}")
+            for j in chunk:
+                results[j] = pd.DataFrame(columns=reports[j]['dimensions'] + reports[j]['metrics'])
+    return [df.copy() for df in results]